@@ -0,0 +1,67 @@
+"""
+Micro-benchmark da extração de campos do e-mail de contrato.
+
+Compara as ~24 chamadas a extract_field (uma regex por campo) com a passada única
+de contract_parser.parse_contract, sobre os corpos reconstruídos a partir do cache.
+
+Uso: python benchmarks/bench_parser.py [repetições]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from samples import load_cached_bodies
+from contract_parser import extract_field, parse_contract
+
+LEGACY_FIELDS = [
+    (r'<b>Software ERP:</b>\s*(.*?)\s*<br />', "Software ERP"),
+    (r'<b>Contrato:</b>\s*(.*?)\s*<br />', "Contrato"),
+    (r'<b>Contrato:</b>\s*(.*?)\s*<br />', "Contrato"),
+    (r'<b>Modelo de Contrato:</b>\s*(.*?)\s*<br />', "Modelo de Contrato"),
+    (r'<b>Data:</b>\s*(.*?)\s*<br />', "Data"),
+    (r'<b>Consultor:</b>\s*(.*?)\s*<br />', "Consultor"),
+    (r'<b>Razão Social:</b>\s*(.*?)\s*<br />', "Razão Social"),
+    (r'<b>CNPJ:</b>\s*(.*?)\s*<br />', "CNPJ"),
+    (r'<b>Nome Fantasia:</b>\s*(.*?)\s*<br />', "Nome Fantasia"),
+    (r'<b>E-mail:</b>\s*(.*?)\s*<br />', "E-mail Contratante"),
+    (r'Valor da Licença:\s*(.*?)\s*<br />', "Valor da Licença"),
+    (r'Tipo de Pagamento:\s*(.*?)\s*<br />', "Tipo de Pagamento"),
+    (r'Forma de Pagamento:\s*(.*?)\s*<br />', "Forma de Pagamento"),
+    (r'Parcelas:\s*(.*?)\s*<br />', "Parcelas"),
+    (r'Entrada pix:\s*(.*?)\s*<br />', "Entrada Pix"),
+    (r'Valor da Mensalidade:\s*(.*?)\s*<br />', "Valor da Mensalidade"),
+    (r'Primeira Mensalidade:\s*(.*?)\s*<br />', "Primeira Mensalidade"),
+    (r'Nome:\s*(.*?)\s*<br />', "Nome Diretor"),
+    (r'E-mail:\s*(.*?)\s*<br />', "E-mail Diretor"),
+    (r'Telefone:\s*(.*?)\s*<br />', "Telefone Diretor"),
+    (r'CPF:\s*(.*?)\s*<br />', "CPF Diretor"),
+    (r'Nome:\s*(.*?)\s*<br />', "Nome Financeiro"),
+    (r'E-mail:\s*(.*?)\s*<br />', "E-mail Financeiro"),
+    (r'Telefone:\s*(.*?)\s*<br />', "Telefone Financeiro"),
+    (r'Qtd. CNPJ:\s*(.*?)\s*<br />', "Qtd. CNPJ"),
+]
+
+def parse_legacy(body):
+    return [extract_field(regex, body, name) for regex, name in LEGACY_FIELDS]
+
+def bench(func, bodies, repeat):
+    """Retorna o tempo médio por mensagem, em microssegundos."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for body in bodies:
+                func(body)
+        elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(bodies)) * 1e6
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    bodies = load_cached_bodies()
+    print(f"{len(bodies)} corpos de contrato, {repeat} repetições")
+
+    legacy = bench(parse_legacy, bodies, repeat)
+    single = bench(parse_contract, bodies, repeat)
+
+    print(f"extract_field x{len(LEGACY_FIELDS)}: {legacy:8.1f} us/mensagem")
+    print(f"parse_contract:       {single:8.1f} us/mensagem ({legacy / single:.1f}x)")
@@ -0,0 +1,153 @@
+"""
+Benchmark das etapas do fluxo, com vazão e p50/p95 por etapa:
+
+  parse  build_contract_info (e o extract_field antigo) sobre corpos HTML sintéticos
+  store  migração de N arquivos cache/*.json para o SQLite, varredura dos pendentes
+         (list_pending), consulta por hash (get_contract) e a leitura antiga da pasta
+  sync   process_json_files completo contra o Bitrix falso (benchmarks/fake_bitrix.py)
+         com latência simulada
+
+Tudo roda em uma pasta temporária; o banco e o Bitrix de verdade não são tocados.
+
+Uso: python benchmarks/bench_stages.py [--stages parse,store,sync] [--contracts 10000]
+                                      [--sync-contracts 200] [--latency 0.02] [--workers 1]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from samples import render_contract_body, synthetic_contract
+import fake_bitrix
+import bitrix_client
+import contract_store
+import rate_limiter
+import run
+import verify_data
+from bench_parser import parse_legacy
+from contract_parser import build_contract_info
+from log_config import setup_logging
+
+def percentile(samples, p):
+    """Percentil por posição mais próxima (samples já ordenadas)."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(p / 100 * len(samples))) - 1))
+    return samples[index]
+
+def report(stage, samples, total=None, unit="ms"):
+    """Imprime n, tempo total, vazão e p50/p95 de uma lista de durações (segundos)."""
+    samples = sorted(samples)
+    total = sum(samples) if total is None else total
+    scale = 1e6 if unit == "us" else 1e3
+    throughput = len(samples) / total if total else 0.0
+    print(
+        f"{stage:<28} n={len(samples):<6} total={total:8.3f}s  {throughput:10.1f}/s  "
+        f"p50={percentile(samples, 50) * scale:9.2f}{unit}  p95={percentile(samples, 95) * scale:9.2f}{unit}"
+    )
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_parse(count):
+    bodies = [render_contract_body(synthetic_contract(i), f"{i:06d}") for i in range(count)]
+    legacy = [timed(parse_legacy, body) for body in bodies]
+    single = [timed(build_contract_info, body) for body in bodies]
+    report("parse: extract_field", legacy, unit="us")
+    report("parse: build_contract_info", single, unit="us")
+
+def bench_store(count, workdir):
+    cache_dir = os.path.join(workdir, "cache")
+    os.makedirs(cache_dir)
+    for i in range(count):
+        with open(os.path.join(cache_dir, f"{i:032x}.json"), "w", encoding="utf-8") as f:
+            json.dump(synthetic_contract(i), f, ensure_ascii=False)
+
+    total = timed(contract_store.migrate_json_cache, cache_dir)
+    print(f"{'store: migrate_json_cache':<28} n={count:<6} total={total:8.3f}s  {count / total:10.1f}/s")
+
+    def scan_json_dir():
+        # Leitura feita pelo run.py antes do banco: um json.load por arquivo da pasta
+        for filename in os.listdir(cache_dir):
+            with open(os.path.join(cache_dir, filename), "r", encoding="utf-8") as f:
+                json.load(f)
+
+    report("store: cache/ dir scan", [timed(scan_json_dir) for _ in range(5)])
+    report("store: list_pending", [timed(contract_store.list_pending) for _ in range(20)])
+
+    hashes = [f"{i:032x}" for i in random.sample(range(count), min(count, 1000))]
+    report("store: get_contract", [timed(contract_store.get_contract, h) for h in hashes], unit="us")
+
+    # Os contratos da etapa store não devem entrar na etapa sync
+    conn = contract_store.get_connection()
+    with conn:
+        conn.execute("UPDATE contracts SET status = ?", (contract_store.STATUS_SYNCED,))
+
+def bench_sync(count, latency, workers):
+    server = fake_bitrix.start_server(latency=latency)
+    bitrix_client.BITRIX_WEBHOOK_URL = fake_bitrix.server_url(server)
+
+    offset = 10 ** 6
+    for i in range(offset, offset + count):
+        contract_store.save_contract(f"sync{i}", synthetic_contract(i))
+
+    durations = []
+    process_contract = run.process_contract
+
+    def timed_process_contract(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return process_contract(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - start)
+
+    run.process_contract = timed_process_contract
+    try:
+        total = timed(run.process_json_files, workers)
+    finally:
+        run.process_contract = process_contract
+        server.shutdown()
+
+    report(f"sync: contrato (workers={workers})", durations, total=total)
+    stats = server.state["stats"]
+    print(f"{'sync: chamadas Bitrix':<28} {stats['requests']} requisições HTTP, {stats['methods']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas parse, store e sync.")
+    parser.add_argument("--stages", default="parse,store,sync")
+    parser.add_argument("--contracts", type=int, default=10000, help="contratos das etapas parse e store")
+    parser.add_argument("--sync-contracts", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="latência do Bitrix falso (segundos)")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+    stages = args.stages.split(",")
+    # As mensagens por contrato atrapalhariam a leitura (e a medição) do benchmark
+    setup_logging("WARNING")
+
+    workdir = tempfile.mkdtemp(prefix="bench_stages_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        contract_store.DB_PATH = os.path.join(workdir, "contracts.db")
+        verify_data.COMPANY_INDEX_FILE = ""
+        # O limite real do Bitrix (2 req/s) dominaria a medição; aqui só a latência conta
+        rate_limiter.RATE = rate_limiter.BURST = 1e9
+
+        if "parse" in stages:
+            bench_parse(args.contracts)
+        if "store" in stages:
+            bench_store(args.contracts, workdir)
+        if "sync" in stages:
+            bench_sync(args.sync_contracts, args.latency, args.workers)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,329 @@
+"""
+Servidor local que imita a API REST do Bitrix24 para testes de carga e regressão,
+sem tocar no portal de produção.
+
+Métodos: crm.company.list/add/update, crm.item.list/add e batch. A latência de cada
+requisição e o limite de requisições (leaky bucket que responde 503
+QUERY_LIMIT_EXCEEDED, como o Bitrix) são configuráveis.
+
+Uso:
+    python benchmarks/fake_bitrix.py --port 8765 --latency 0.05 --rate 2 --burst 50
+    BITRIX_WEBHOOK_URL=http://127.0.0.1:8765/rest/1/fake/ python run.py sync
+
+GET /stats devolve a contagem de chamadas por método.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+PAGE_SIZE = 50
+
+# Campos personalizados usados pelos fluxos de criação
+CNPJ_FIELD = "UF_CRM_1701275490640"
+SYSTEM_FIELD = "UF_CRM_1708446996746"
+
+OPERATORS = (">=", "<=", "!=", ">", "<", "!", "=")
+
+class MethodError(Exception):
+    """Erro devolvido pelo método no formato {"error": ..., "error_description": ...}."""
+
+def _now():
+    return datetime.now(timezone.utc).astimezone().isoformat(timespec='seconds')
+
+def new_state(latency=0.0, jitter=0.0, rate=None, burst=50, error_rate=0.0):
+    """Cria o estado do servidor: dados, configuração e contadores."""
+    return {
+        "lock": threading.RLock(),
+        "ids": itertools.count(1),
+        "companies": {},
+        "items": {},
+        "latency": latency,
+        "jitter": jitter,
+        "rate": rate,
+        "burst": burst,
+        "error_rate": error_rate,
+        "level": 0.0,
+        "last": time.monotonic(),
+        "stats": {"requests": 0, "limited": 0, "methods": {}},
+    }
+
+def seed_companies(state, count, system_id="237"):
+    """Cadastra `count` empresas sintéticas (CNPJs 99.xxx.xxx/0001-00)."""
+    for i in range(count):
+        digits = f"99{i:06d}000100"
+        cnpj = f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/{digits[8:12]}-{digits[12:]}"
+        company_add(state, {"fields": {"TITLE": f"Empresa Sintética {i}", CNPJ_FIELD: cnpj, SYSTEM_FIELD: system_id}})
+
+def unflatten_query(query):
+    """Converte a query string de um comando do batch (filter[X]=Y) em parâmetros aninhados."""
+    params = {}
+    for name, values in parse_qs(query, keep_blank_values=True).items():
+        head, _, rest = name.partition("[")
+        keys = [head] + (rest[:-1].split("][") if rest else [])
+        target = params
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = values[0]
+
+    def to_lists(value):
+        if isinstance(value, dict):
+            if value and all(key.isdigit() for key in value):
+                return [to_lists(value[key]) for key in sorted(value, key=int)]
+            return {key: to_lists(item) for key, item in value.items()}
+        return value
+
+    return to_lists(params)
+
+def split_operator(key):
+    for operator in OPERATORS:
+        if key.startswith(operator):
+            return operator, key[len(operator):]
+    return "=", key
+
+def compare(value, operator, expected):
+    """Compara como número quando os dois lados são numéricos; senão como texto."""
+    value = "" if value is None else str(value)
+    expected = str(expected)
+    if value.lstrip("-").isdigit() and expected.lstrip("-").isdigit():
+        value, expected = int(value), int(expected)
+
+    if operator == "=":
+        return value == expected
+    if operator in ("!", "!="):
+        return value != expected
+    if operator == ">=":
+        return value >= expected
+    if operator == "<=":
+        return value <= expected
+    if operator == ">":
+        return value > expected
+    return value < expected
+
+def matches(record, filters):
+    for key, expected in (filters or {}).items():
+        operator, field = split_operator(key)
+        if not compare(record.get(field), operator, expected):
+            return False
+    return True
+
+def paginate(records, params, key_name=None):
+    """Aplica start/PAGE_SIZE e monta result/total/next como o Bitrix."""
+    start = int(params.get("start") or 0)
+    page = records[start:start + PAGE_SIZE]
+    response = {"result": {key_name: page} if key_name else page, "total": len(records)}
+    if start + PAGE_SIZE < len(records):
+        response["next"] = start + PAGE_SIZE
+    return response
+
+def select_fields(record, select, id_field):
+    if not select or "*" in select:
+        return dict(record)
+    return {field: record.get(field) for field in [id_field] + [f for f in select if f != id_field]}
+
+def company_list(state, params):
+    companies = [c for c in state["companies"].values() if matches(c, params.get("filter"))]
+    companies.sort(key=lambda c: int(c["ID"]))
+    companies = [select_fields(c, params.get("select"), "ID") for c in companies]
+    return paginate(companies, params)
+
+def company_add(state, params):
+    company_id = str(next(state["ids"]))
+    company = {key: ("" if value is None else value) for key, value in (params.get("fields") or {}).items()}
+    if SYSTEM_FIELD in company:
+        company[SYSTEM_FIELD] = str(company[SYSTEM_FIELD])
+    company.update({"ID": company_id, "DATE_CREATE": _now(), "DATE_MODIFY": _now()})
+    state["companies"][company_id] = company
+    return {"result": int(company_id)}
+
+def company_update(state, params):
+    company = state["companies"].get(str(params.get("id")))
+    if company is None:
+        raise MethodError("Not found")
+    company.update({key: str(value) for key, value in (params.get("fields") or {}).items()})
+    company["DATE_MODIFY"] = _now()
+    return {"result": True}
+
+def item_list(state, params):
+    entity_type_id = str(params.get("entityTypeId"))
+    items = [
+        item for item in state["items"].values()
+        if str(item["entityTypeId"]) == entity_type_id and matches(item, params.get("filter"))
+    ]
+    items.sort(key=lambda item: item["id"])
+    items = [select_fields(item, params.get("select"), "id") for item in items]
+    return paginate(items, params, "items")
+
+def item_add(state, params):
+    if not params.get("entityTypeId"):
+        raise MethodError("entityTypeId is required")
+    item = dict(params.get("fields") or {})
+    item.update({"id": next(state["ids"]), "entityTypeId": params["entityTypeId"], "createdTime": _now()})
+    state["items"][item["id"]] = item
+    return {"result": {"item": item}}
+
+def batch(state, params):
+    result, errors, totals, nexts = {}, {}, {}, {}
+    for key, command in (params.get("cmd") or {}).items():
+        method, _, query = command.partition("?")
+        try:
+            response = call_method(state, method, unflatten_query(query))
+        except MethodError as e:
+            errors[key] = {"error": "ERROR_CORE", "error_description": str(e)}
+            if str(params.get("halt", 0)) == "1":
+                break
+            continue
+
+        result[key] = response["result"]
+        if "total" in response:
+            totals[key] = response["total"]
+        if "next" in response:
+            nexts[key] = response["next"]
+
+    return {"result": {"result": result, "result_error": errors, "result_total": totals, "result_next": nexts}}
+
+METHODS = {
+    "crm.company.list": company_list,
+    "crm.company.add": company_add,
+    "crm.company.update": company_update,
+    "crm.item.list": item_list,
+    "crm.item.add": item_add,
+    "batch": batch,
+}
+
+def call_method(state, method, params):
+    handler = METHODS.get(method)
+    if handler is None:
+        raise MethodError(f"Method '{method}' not found")
+
+    with state["lock"]:
+        stats = state["stats"]["methods"]
+        stats[method] = stats.get(method, 0) + 1
+        return handler(state, params)
+
+def limit_exceeded(state):
+    """Leaky bucket do Bitrix: cada requisição enche o balde em 1; ele esvazia `rate` por segundo."""
+    if random.random() < state["error_rate"]:
+        return True
+    if not state["rate"]:
+        return False
+
+    with state["lock"]:
+        now = time.monotonic()
+        state["level"] = max(0.0, state["level"] - (now - state["last"]) * state["rate"])
+        state["last"] = now
+        if state["level"] + 1 > state["burst"]:
+            return True
+        state["level"] += 1
+        return False
+
+class FakeBitrixHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalho e corpo saem em escritas separadas; sem TCP_NODELAY o keep-alive
+    # esbarra no delayed ACK (~40 ms por requisição) e distorce as medições
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.state["lock"]:
+                self.send_json(200, self.server.state["stats"])
+        else:
+            self.send_json(404, {"error": "NOT_FOUND"})
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if state["latency"] or state["jitter"]:
+            time.sleep(state["latency"] + random.uniform(0, state["jitter"]))
+
+        with state["lock"]:
+            state["stats"]["requests"] += 1
+
+        if limit_exceeded(state):
+            with state["lock"]:
+                state["stats"]["limited"] += 1
+            self.send_json(503, {"error": "QUERY_LIMIT_EXCEEDED", "error_description": "Too many requests"})
+            return
+
+        # URL do webhook: /rest/<usuário>/<token>/<método>.json
+        method = self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+        if method.endswith(".json"):
+            method = method[:-5]
+
+        try:
+            if "json" in (self.headers.get("Content-Type") or ""):
+                params = json.loads(raw or b"{}")
+            else:
+                params = unflatten_query(raw.decode())
+            self.send_json(200, call_method(state, method, params))
+        except MethodError as e:
+            self.send_json(400, {"error": "ERROR_CORE", "error_description": str(e)})
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": "INVALID_REQUEST", "error_description": str(e)})
+
+def create_server(host="127.0.0.1", port=0, **options):
+    """Cria o servidor (porta 0 = porta livre qualquer); as opções vão para new_state."""
+    companies = options.pop("companies", 0)
+    server = ThreadingHTTPServer((host, port), FakeBitrixHandler)
+    server.daemon_threads = True
+    server.state = new_state(**options)
+    seed_companies(server.state, companies)
+    return server
+
+def server_url(server):
+    """URL de webhook que aponta para o servidor, para usar em BITRIX_WEBHOOK_URL."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/rest/1/fake/"
+
+def start_server(**options):
+    """Sobe o servidor em uma thread em segundo plano e o retorna."""
+    server = create_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API REST do Bitrix24.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos de atraso em cada requisição")
+    parser.add_argument("--jitter", type=float, default=0.0, help="atraso extra aleatório de até N segundos")
+    parser.add_argument("--rate", type=float, default=None, help="requisições por segundo antes do 503 (ex.: 2)")
+    parser.add_argument("--burst", type=float, default=50, help="tamanho do balde do limite")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de requisições respondidas com 503")
+    parser.add_argument("--companies", type=int, default=0, help="empresas sintéticas pré-cadastradas")
+    args = parser.parse_args(argv)
+
+    server = create_server(
+        args.host, args.port, latency=args.latency, jitter=args.jitter, rate=args.rate,
+        burst=args.burst, error_rate=args.error_rate, companies=args.companies
+    )
+    print(f"Bitrix falso em {server_url(server)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.state["stats"], indent=2))
+        server.server_close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
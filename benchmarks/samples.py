@@ -0,0 +1,92 @@
+import glob
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Modelo do corpo HTML enviado por contratos@setuptecnologia.com.br
+CONTRACT_BODY_TEMPLATE = """<html><body>
+<b>Software ERP:</b> {softwareERP}<br />
+<b>Contrato:</b> {contrato}<br />
+<b>Modelo de Contrato:</b> {modeloDeContrato}<br />
+<b>Data:</b> {data}<br />
+<b>Consultor:</b> {consultor}<br />
+<b>Razão Social:</b> {razaoSocial}<br />
+<b>CNPJ:</b> {cnpj}<br />
+<b>Nome Fantasia:</b> {razaoSocial}<br />
+<b>E-mail:</b> {emailContratante}<br />
+<br />
+Valor da Licença: {valorLicenca}<br />
+Tipo de Pagamento: Parcelado<br />
+Forma de Pagamento: Boleto<br />
+Parcelas: 3<br />
+Entrada pix: R$ 0,00<br />
+Valor da Mensalidade: {valorMensalidade}<br />
+Primeira Mensalidade: 10/02/2025<br />
+Qtd. CNPJ: {qtdCnpj}<br />
+<br />
+<b>Diretor</b><br />
+Nome: {diretor}<br />
+E-mail: {emailDiretor}<br />
+Telefone: {telefoneDiretor}<br />
+CPF: 000.000.000-00<br />
+<br />
+<b>Financeiro</b><br />
+Nome: Financeiro {razaoSocial}<br />
+E-mail: {emailFinanceiro}<br />
+Telefone: {telefoneFinanceiro}<br />
+</body></html>
+"""
+
+def render_contract_body(data, contrato):
+    """Monta um corpo de e-mail de contrato a partir de um registro do cache."""
+    emails = [e.strip() for e in data.get("emails") or [] if e] + ["contato@exemplo.com.br"] * 3
+    phones = list(data.get("phones") or []) + ["+5541999999999"] * 2
+    return CONTRACT_BODY_TEMPLATE.format(
+        softwareERP="Outro",
+        contrato=contrato,
+        modeloDeContrato=data.get("modeloDeContrato", ""),
+        data="01/01/2025",
+        consultor=data.get("consultor", ""),
+        razaoSocial=data.get("razaoSocial", ""),
+        cnpj=data.get("cnpj", ""),
+        emailContratante=emails[0],
+        emailDiretor=emails[1],
+        emailFinanceiro=emails[2],
+        valorLicenca=data.get("valorLicenca") or "",
+        valorMensalidade=data.get("valorMensalidade") or "",
+        qtdCnpj=data.get("qtdCnpj") or "",
+        diretor=data.get("diretor") or "",
+        telefoneDiretor=phones[0],
+        telefoneFinanceiro=phones[1],
+    )
+
+def load_cached_bodies(cache_dir=os.path.join(ROOT_DIR, "cache")):
+    """Reconstrói os corpos de e-mail dos contratos já presentes no cache."""
+    bodies = []
+    for i, path in enumerate(sorted(glob.glob(os.path.join(cache_dir, "*.json")))):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        bodies.append(render_contract_body(data, f"{i + 1:06d}"))
+    return bodies
+
+SYNTHETIC_MODELOS = ["Sittax - Simples Nacional", "Openix - Sittax SN", "Acessórias", "Acessórias + Komunic"]
+
+def synthetic_contract(i):
+    """Gera os dados de um contrato sintético (CNPJ único por índice), no formato do banco."""
+    digits = f"{i:08d}000199"
+    return {
+        "razaoSocial": f"Empresa Teste {i} LTDA",
+        "cnpj": f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/{digits[8:12]}-{digits[12:]}",
+        "modeloDeContrato": SYNTHETIC_MODELOS[i % len(SYNTHETIC_MODELOS)],
+        "consultor": "Consultor Teste",
+        "emails": [f"contato{i}@exemplo.com.br", f"diretor{i}@exemplo.com.br"],
+        "phones": ["+5541999999999"],
+        "valorMensalidade": "R$ 329,00 (trezentos e vinte e nove reais)",
+        "valorLicenca": "R$ 1.500,00 (um mil e quinhentos reais)",
+        "qtdCnpj": "100",
+        "diretor": f"Diretor {i}",
+    }
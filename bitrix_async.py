@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import httpx
+
+import bitrix_client
+import metrics
+import rate_limiter
+from verify_data import (
+    build_company_lookup_payload,
+    build_company_system_payload,
+    build_recent_cards_payload,
+    cache_company_response,
+    check_company_missing,
+    company_system_updated,
+    confirmed_company,
+    get_cached_cards,
+    get_cached_company,
+    recovered_card_id,
+    recovered_company_id,
+    register_company
+)
+
+logger = logging.getLogger(__name__)
+
+# Versão assíncrona (httpx) das operações usadas pelo fluxo de criação (contract_flow),
+# com os mesmos nomes e parâmetros de bitrix_sync. Os payloads
+# vêm dos mesmos build_*_payload de create_sittax / create_acessorias (passados como
+# "flow"), e os caches de empresas e cards são os mesmos de verify_data.
+
+_client = None
+
+def get_client():
+    """Retorna o cliente HTTP assíncrono compartilhado, criado na primeira chamada."""
+    global _client
+    if _client is None:
+        limits = httpx.Limits(max_connections=bitrix_client.POOL_SIZE, max_keepalive_connections=bitrix_client.POOL_SIZE)
+        timeout = httpx.Timeout(bitrix_client.READ_TIMEOUT, connect=bitrix_client.CONNECT_TIMEOUT)
+        _client = httpx.AsyncClient(limits=limits, timeout=timeout)
+    return _client
+
+async def close():
+    """Fecha as conexões do cliente assíncrono."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def post(method, payload):
+    """
+    Faz um POST no método REST do Bitrix, com o mesmo rate_limiter e as mesmas
+    retentativas em 503 de bitrix_client.post, sem bloquear o event loop.
+    """
+    attempt = 0
+    while True:
+        wait = rate_limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        metrics.increment(f"bitrix.calls.{method}")
+        with metrics.timer(f"bitrix.{method}"):
+            response = await get_client().post(bitrix_client.method_url(method), json=payload)
+
+        if response.status_code != 503 or attempt >= rate_limiter.MAX_RETRIES:
+            return response
+
+        delay = rate_limiter.limit_exceeded(attempt)
+        attempt += 1
+        logger.warning("Bitrix respondeu 503 em %s. Tentativa %s/%s em %.1f segundos...", method, attempt, rate_limiter.MAX_RETRIES, delay)
+        await asyncio.sleep(delay)
+
+async def bitrix_api_call(method, params):
+    """Faz uma chamada à API do Bitrix e retorna o resultado (ou None em caso de erro)."""
+    try:
+        response = await post(method, params)
+    except httpx.HTTPError as e:
+        logger.error("Erro de conexão com a API Bitrix (%s): %s", method, e)
+        return None
+
+    if response.status_code == 200:
+        return response.json()
+
+    logger.error("Erro na API Bitrix: %s - %s", response.status_code, response.text)
+    return None
+
+async def bitrix_create_call(method, params, company_id=None):
+    """
+    Como bitrix_api_call, para chamadas que criam registros: erros de conexão (ex.:
+    timeout) sobem para quem chamou, porque o Bitrix pode ter gravado o registro e a
+    intenção precisa continuar pendente no diário (journal). Com company_id, uma
+    resposta de empresa inexistente levanta CompanyNotFoundError.
+    """
+    response = await post(method, params)
+    if response.status_code == 200:
+        return response.json()
+
+    if company_id is not None:
+        check_company_missing(company_id, response)
+
+    logger.error("Erro na API Bitrix: %s - %s", response.status_code, response.text)
+    return None
+
+async def check_company_in_bitrix(cnpj):
+    """Versão assíncrona de verify_data.check_company_in_bitrix."""
+    cached = get_cached_company(cnpj)
+    if cached is not None:
+        return cached
+
+    response = await bitrix_api_call("crm.company.list", build_company_lookup_payload(cnpj))
+    cache_company_response(cnpj, response)
+    return response
+
+async def find_company(cnpj):
+    """Versão assíncrona de verify_data.find_company."""
+    return confirmed_company(cnpj, await bitrix_api_call("crm.company.list", build_company_lookup_payload(cnpj)))
+
+async def find_company_id(cnpj):
+    """Versão assíncrona de verify_data.find_company_id."""
+    return recovered_company_id(cnpj, await bitrix_api_call("crm.company.list", build_company_lookup_payload(cnpj)))
+
+async def find_card_created_since(flow, company_id, since):
+    """Versão assíncrona de verify_data.find_card_created_since, na SPA do fluxo."""
+    response = await bitrix_api_call("crm.item.list", build_recent_cards_payload(flow.CARD_ENTITY_TYPE_ID, company_id, since))
+    return recovered_card_id(company_id, response)
+
+async def create_company_in_bitrix(flow, company_data):
+    """Cria a empresa com o payload do fluxo e retorna o ID (ou None)."""
+    payload = flow.build_company_payload(company_data)
+    if payload is None:
+        return None
+
+    response = await bitrix_create_call("crm.company.add", payload)
+    company_id = response.get("result") if response else None
+    if not company_id:
+        logger.error("Erro ao criar empresa %s.", company_data['razaoSocial'])
+        return None
+
+    logger.debug("Empresa %s criada com sucesso.", company_data['razaoSocial'])
+    register_company(company_data.get("cnpj", ""), company_id, payload["fields"]["UF_CRM_1708446996746"], created=True)
+    return company_id
+
+async def update_company_system(cnpj, company_id, system_id):
+    """Versão assíncrona de verify_data.update_company_system."""
+    response = await bitrix_create_call("crm.company.update", build_company_system_payload(company_id, system_id), company_id)
+    return company_system_updated(cnpj, company_id, system_id, response)
+
+async def check_card_exists(flow, company_id):
+    """Retorna os IDs dos cards ativos da empresa na SPA do fluxo (None se a consulta falhar)."""
+    cached_card_ids = get_cached_cards(flow.CARD_ENTITY_TYPE_ID, company_id)
+    if cached_card_ids is not None:
+        return cached_card_ids
+
+    response = await bitrix_api_call("crm.item.list", flow.build_card_list_payload(company_id))
+    if response is None:
+        logger.error("Erro ao verificar cards para a empresa ID %s.", company_id)
+        return None
+
+    items = response.get("result", {}).get("items")
+    card_ids = [str(item["id"]) for item in items] if isinstance(items, list) else []
+    logger.debug("Cards encontrados para a empresa ID %s: %s", company_id, card_ids)
+    return card_ids
+
+async def create_card_in_bitrix(flow, company_data, company_id):
+    """Cria o card do fluxo para a empresa e retorna o ID (ou None)."""
+    payload = flow.build_card_payload(company_data, company_id)
+    if payload is None:
+        return None
+
+    response = await bitrix_create_call("crm.item.add", payload, company_id)
+    card_id = response.get("result") if response else None
+    if isinstance(card_id, dict) and "item" in card_id and "id" in card_id["item"]:
+        card_id = card_id["item"]["id"]
+
+    if not card_id:
+        logger.error("❌ Erro ao criar card para a empresa %s.", company_data['razaoSocial'])
+        return None
+
+    logger.debug("✅ Card criado com sucesso para a empresa %s.", company_data['razaoSocial'])
+    return card_id
@@ -0,0 +1,74 @@
+import os
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+import metrics
+import rate_limiter
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configurações da API do Bitrix
+BITRIX_WEBHOOK_URL = os.getenv('BITRIX_WEBHOOK_URL')
+
+# Conexões mantidas abertas (keep-alive) e reaproveitadas entre as chamadas
+POOL_SIZE = int(os.getenv('BITRIX_POOL_SIZE', '10'))
+CONNECT_TIMEOUT = float(os.getenv('BITRIX_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('BITRIX_READ_TIMEOUT', '30'))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Retorna a sessão HTTP compartilhada, criando o pool de conexões na primeira chamada."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def method_url(method):
+    """Monta a URL do método REST a partir do webhook configurado."""
+    return f"{BITRIX_WEBHOOK_URL.rstrip('/')}/{method}.json"
+
+def post(method, payload):
+    """
+    Faz um POST no método REST do Bitrix usando a sessão compartilhada.
+
+    Toda chamada passa pelo rate_limiter antes de sair. Respostas 503 (inclusive
+    QUERY_LIMIT_EXCEEDED) são repetidas com backoff exponencial e jitter até
+    rate_limiter.MAX_RETRIES vezes; a última resposta é retornada.
+    """
+    attempt = 0
+    while True:
+        rate_limiter.acquire()
+        metrics.increment(f"bitrix.calls.{method}")
+        with metrics.timer(f"bitrix.{method}"):
+            response = get_session().post(method_url(method), json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+
+        if response.status_code != 503 or attempt >= rate_limiter.MAX_RETRIES:
+            return response
+
+        delay = rate_limiter.limit_exceeded(attempt)
+        attempt += 1
+        logger.warning("Bitrix respondeu 503 em %s. Tentativa %s/%s em %.1f segundos...", method, attempt, rate_limiter.MAX_RETRIES, delay)
+        time.sleep(delay)
+
+def close():
+    """Fecha as conexões abertas do pool."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,22 @@
+import verify_data
+from verify_data import card_id_from_response, check_company_in_bitrix, find_company, find_company_id, update_company_system
+
+# Operações usadas pelo fluxo de criação (contract_flow) com as chamadas síncronas de
+# verify_data e dos módulos de cada fluxo (create_sittax / create_acessorias, passados
+# como "flow"). Os nomes e parâmetros são os mesmos de bitrix_async.
+
+def find_card_created_since(flow, company_id, since):
+    """Procura um card da empresa criado a partir de `since` na SPA do fluxo."""
+    return verify_data.find_card_created_since(flow.CARD_ENTITY_TYPE_ID, company_id, since)
+
+def create_company_in_bitrix(flow, company_data):
+    """Cria a empresa com o payload do fluxo e retorna o ID (ou None)."""
+    return flow.create_company_in_bitrix(company_data)
+
+def check_card_exists(flow, company_id):
+    """Retorna os IDs dos cards ativos da empresa na SPA do fluxo (None se a consulta falhar)."""
+    return flow.check_card_exists(company_id)
+
+def create_card_in_bitrix(flow, company_data, company_id):
+    """Cria o card do fluxo para a empresa e retorna o ID (ou None)."""
+    return card_id_from_response(flow.create_card_in_bitrix(company_data, company_id))
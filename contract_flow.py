@@ -0,0 +1,218 @@
+import logging
+
+import journal
+import bitrix_sync
+import bitrix_async
+import create_sittax
+import create_acessorias
+from verify_data import combine_systems, register_card, CompanyNotFoundError, MODELO_CONTRATO_CONFIG, SYSTEM_MAPPING
+from contract_store import (
+    get_contract,
+    mark_company_missing,
+    mark_failed,
+    set_state,
+    STATUS_COMPANY_CREATED,
+    STATUS_CARD_CREATED,
+    STATUS_NOTIFIED,
+    STATUS_SYNCED
+)
+
+logger = logging.getLogger(__name__)
+
+# Decisões do fluxo de criação (diário -> afiliação -> empresa -> card), escritas uma
+# única vez como gerador: cada chamada ao Bitrix é produzida (yield) como
+# (operação, argumentos) e executada por run_sync (bitrix_sync) ou run_async
+# (bitrix_async), que devolvem o resultado ao gerador. Exceções de uma chamada são
+# levantadas no ponto do yield.
+
+MODELOS_SITTAX = ["Openix - Sittax SN", "Sittax - Simples Nacional"]
+MODELOS_ACESSORIAS = ["Acessórias", "Acessórias + Komunic"]
+
+# Fluxo (módulo com os payloads e a SPA do card) de cada modelo de contrato
+FLOWS = {modelo: create_sittax for modelo in MODELOS_SITTAX}
+FLOWS.update({modelo: create_acessorias for modelo in MODELOS_ACESSORIAS})
+
+def run_sync(steps):
+    """Executa as etapas de um fluxo com as chamadas síncronas e retorna o resultado."""
+    try:
+        call = next(steps)
+        while True:
+            method, args = call
+            try:
+                result = getattr(bitrix_sync, method)(*args)
+            except Exception as e:
+                call = steps.throw(e)
+            else:
+                call = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+async def run_async(steps):
+    """Executa as etapas de um fluxo com as chamadas assíncronas e retorna o resultado."""
+    try:
+        call = next(steps)
+        while True:
+            method, args = call
+            try:
+                result = await getattr(bitrix_async, method)(*args)
+            except Exception as e:
+                call = steps.throw(e)
+            else:
+                call = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+def comp_and_card_steps(flow, hash_value):
+    """
+    Cria (ou reaproveita) a empresa e o card do fluxo para o contrato, avançando o
+    estado salvo no banco a cada etapa. Contratos já concluídos são ignorados e os que
+    pararam no meio são retomados da etapa em que estavam. Retorna o registro do card
+    criado (ou None).
+    """
+    contract = get_contract(hash_value)
+    if contract is None:
+        logger.error("❌ Contrato para o hash %s não encontrado.", hash_value)
+        return None
+
+    if contract["status"] in (STATUS_CARD_CREATED, STATUS_NOTIFIED, STATUS_SYNCED):
+        logger.debug("⏭️ Contrato %s já processado (%s).", hash_value, contract['status'])
+        return None
+
+    company_data = contract["data"]
+    modelo_contrato = company_data.get("modeloDeContrato", "").strip()
+    cnpj = company_data.get("cnpj")
+    company_id = contract["company_id"]
+    company_key = journal.journal_key(hash_value, "crm.company.add")
+
+    if not company_id:
+        # Empresa criada por este contrato em uma execução que parou antes de salvar o estado
+        company_id = yield from journal.resume(company_key, lambda since: ("find_company_id", (cnpj,)))
+        if company_id:
+            set_state(hash_value, STATUS_COMPANY_CREATED, company_id=company_id)
+
+    if company_id:
+        logger.info("🔄 Retomando contrato %s com a empresa ID %s.", hash_value, company_id)
+    else:
+        expected_system_id = flow.MODELO_CONTRATO_TO_ID.get(modelo_contrato, flow.DEFAULT_SYSTEM_ID)
+        company_response = yield "check_company_in_bitrix", (cnpj,)
+        if not company_response or "result" not in company_response:
+            # Sem a resposta não dá para saber se a empresa existe: criar poderia duplicá-la
+            logger.error("❌ Erro ao consultar a empresa com CNPJ %s no Bitrix.", cnpj)
+            mark_failed(hash_value, "Erro ao consultar a empresa no Bitrix")
+            return None
+        companies = company_response["result"]
+
+        if companies and str(companies[0].get("UF_CRM_1708446996746") or "") == str(expected_system_id):
+            # A resposta pode ter vindo do índice ou do cache, que podem estar desatualizados:
+            # o estado final só é gravado depois de confirmar a empresa direto na API
+            try:
+                company = yield "find_company", (cnpj,)
+            except RuntimeError as e:
+                logger.warning("⚠️ %s. O contrato %s continua pendente.", e, hash_value)
+                return None
+            companies = [company] if company else []
+
+        if companies:
+            current_system_id = str(companies[0].get("UF_CRM_1708446996746") or "")
+            if current_system_id == str(expected_system_id):
+                logger.info("✅ Empresa com CNPJ %s já existe no Bitrix24 e está associada ao sistema %s.",
+                            cnpj, SYSTEM_MAPPING.get(current_system_id, "Desconhecido"))
+                set_state(hash_value, STATUS_SYNCED)
+                return None
+
+            company_id = companies[0]["ID"]
+            logger.info("🔄 Usando empresa existente ID: %s", company_id)
+        else:
+            company_id = yield from journal.run_once(
+                company_key, hash_value, "crm.company.add", ("create_company_in_bitrix", (flow, company_data))
+            )
+            if not company_id:
+                logger.error("❌ Erro ao criar empresa %s", company_data['razaoSocial'])
+                mark_failed(hash_value, "Erro ao criar empresa no Bitrix")
+                return None
+            logger.info("🏢 Nova empresa criada com sucesso. ID: %s", company_id)
+
+        set_state(hash_value, STATUS_COMPANY_CREATED, company_id=company_id)
+
+    # Card criado por este contrato em uma execução anterior (o diário dispensa a consulta)
+    card_key = journal.journal_key(hash_value, "crm.item.add")
+    card_id = yield from journal.resume(
+        card_key, lambda since: ("find_card_created_since", (flow, company_id, since))
+    )
+
+    if not card_id:
+        existing_card_ids = yield "check_card_exists", (flow, company_id)
+        if existing_card_ids is None:
+            logger.error("❌ Erro ao consultar os cards da empresa ID %s no Bitrix.", company_id)
+            mark_failed(hash_value, "Erro ao consultar os cards no Bitrix")
+            return None
+        if existing_card_ids:
+            logger.info("⚠️ Card(s) já existente(s) para %s. IDs: %s", company_data['razaoSocial'], existing_card_ids)
+            set_state(hash_value, STATUS_SYNCED, card_id=existing_card_ids[0])
+            return None
+
+        # Só cria um novo card se não existir nenhum
+        logger.debug("➕ Criando novo card...")
+        try:
+            card_id = yield from journal.run_once(
+                card_key, hash_value, "crm.item.add", ("create_card_in_bitrix", (flow, company_data, company_id))
+            )
+        except CompanyNotFoundError as e:
+            # Empresa apagada ou mesclada no Bitrix: o card não foi criado e a empresa
+            # (inclusive a registrada no diário) é resolvida de novo na próxima tentativa
+            logger.error("❌ %s", e)
+            journal.settle(card_key, None)
+            journal.settle(company_key, None)
+            mark_company_missing(hash_value, e)
+            return None
+
+    if not card_id:
+        logger.error("❌ Erro: O card não foi criado corretamente para %s.", company_data['razaoSocial'])
+        mark_failed(hash_value, "Erro ao criar card no Bitrix")
+        return None
+
+    logger.info("✅ Card criado com sucesso para %s. ID: %s", company_data['razaoSocial'], card_id)
+    register_card(flow.CARD_ENTITY_TYPE_ID, company_id, card_id)
+    set_state(hash_value, STATUS_CARD_CREATED, card_id=card_id)
+    return {
+        "hash": hash_value,
+        "razaoSocial": company_data["razaoSocial"],
+        "cnpj": company_data["cnpj"],
+        "card_id": str(card_id),
+        "modeloDeContrato": modelo_contrato
+    }
+
+def company_system_steps(cnpj, modelos):
+    """
+    Atualiza o sistema da empresa (UF_CRM_1708446996746) para cobrir os produtos dos
+    cards criados (ex.: Acessórias + Sittax -> 655), quando o sistema atual ainda não
+    os cobre. Deve rodar com o lock do CNPJ, logo depois da criação dos cards.
+    """
+    company_response = yield "check_company_in_bitrix", (cnpj,)
+    companies = company_response.get("result") if company_response else None
+    if not companies:
+        return None
+
+    current_system_id = str(companies[0].get("UF_CRM_1708446996746") or "")
+    expected = [MODELO_CONTRATO_CONFIG[modelo]["system_id"] for modelo in modelos if modelo in MODELO_CONTRATO_CONFIG]
+    new_system_id = combine_systems([current_system_id] + expected)
+
+    if new_system_id and new_system_id != current_system_id:
+        yield "update_company_system", (cnpj, companies[0]["ID"], new_system_id)
+    return new_system_id
+
+def create_comp_and_card(flow, hash_value):
+    """Executa comp_and_card_steps com as chamadas síncronas (requests)."""
+    return run_sync(comp_and_card_steps(flow, hash_value))
+
+async def create_comp_and_card_async(flow, hash_value):
+    """Executa comp_and_card_steps com as chamadas assíncronas (httpx)."""
+    return await run_async(comp_and_card_steps(flow, hash_value))
+
+def update_company_system(cnpj, modelos):
+    """Executa company_system_steps com as chamadas síncronas (requests)."""
+    return run_sync(company_system_steps(cnpj, modelos))
+
+async def update_company_system_async(cnpj, modelos):
+    """Executa company_system_steps com as chamadas assíncronas (httpx)."""
+    return await run_async(company_system_steps(cnpj, modelos))
@@ -0,0 +1,190 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rótulos conhecidos do e-mail de contrato
+LABELS = {
+    "Modelo de Contrato",
+    "Software ERP",
+    "Razão Social",
+    "Nome Fantasia",
+    "Valor da Licença",
+    "Tipo de Pagamento",
+    "Forma de Pagamento",
+    "Entrada pix",
+    "Valor da Mensalidade",
+    "Primeira Mensalidade",
+    "Qtd. CNPJ",
+    "Contrato",
+    "Consultor",
+    "Parcelas",
+    "Telefone",
+    "E-mail",
+    "CNPJ",
+    "Data",
+    "Nome",
+    "CPF",
+}
+
+# Seções do e-mail: dados da empresa, depois bloco do diretor, depois bloco do financeiro
+SECTION_EMPRESA = "empresa"
+SECTION_DIRETOR = "diretor"
+SECTION_FINANCEIRO = "financeiro"
+SECTION_ORDER = [SECTION_EMPRESA, SECTION_DIRETOR, SECTION_FINANCEIRO]
+
+# Campos que se repetem em cada bloco de pessoa (diretor / financeiro)
+PERSON_LABELS = {"Nome", "E-mail", "Telefone", "CPF"}
+
+# Padrões pré-compilados (compilados uma única vez na importação do módulo)
+# Fim de linha no HTML: <br /> ou o fechamento de um bloco (parágrafo, div, linha de tabela...)
+LINE_BREAK_RE = re.compile(r'<br\s*/?>|</(?:p|div|tr|li|h[1-6])\s*>', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]+>')
+DIGITS_RE = re.compile(r'\D')
+SECTION_HEADING_RE = re.compile(r'(diretor|financeiro)', re.IGNORECASE)
+
+def clean_value(value):
+    """Remove tags HTML, &nbsp; e espaços extras de um valor extraído."""
+    if '<' in value:
+        value = TAG_RE.sub('', value)
+    if '&' in value:
+        value = value.replace('&nbsp;', ' ')
+    return ' '.join(value.split())
+
+def parse_contract(body):
+    """
+    Percorre o corpo do e-mail de contrato uma única vez e devolve um dicionário
+    {seção: {rótulo: valor}}.
+
+    O corpo é quebrado nos <br /> (e fins de parágrafo) e cada trecho "Rótulo: valor" é resolvido por
+    consulta em LABELS, sem uma regex por campo. Os blocos de Diretor e Financeiro
+    são identificados pelos títulos das seções ou, na falta deles, pela repetição dos
+    campos de pessoa (o segundo "Nome:" pertence ao financeiro).
+    """
+    sections = {section: {} for section in SECTION_ORDER}
+    current = SECTION_EMPRESA
+
+    for segment in LINE_BREAK_RE.split(body):
+        colon = segment.find(':')
+        head = segment if colon < 0 else segment[:colon]
+        if '<' in head:
+            # Tags viram quebras de linha: em "<p><b>Diretor</b></p><p>Nome:" o título e o
+            # rótulo ficam em linhas separadas, como quando o HTML usa quebras de linha
+            head = TAG_RE.sub('\n', head)
+
+        # O rótulo é a última linha antes do ':'; o que vem antes pode ser um título de seção
+        prefix, _, label = head.rstrip().rpartition('\n')
+        label = label.strip()
+        if colon < 0:
+            prefix, label = head, None
+
+        if prefix.strip() and len(prefix) < 80:
+            heading = SECTION_HEADING_RE.search(prefix)
+            if heading:
+                current = heading.group(1).lower()
+
+        if label not in LABELS:
+            continue
+
+        if label in PERSON_LABELS:
+            if current == SECTION_EMPRESA and label == "Nome":
+                # O bloco da empresa não tem "Nome:", então começa o bloco do diretor
+                current = SECTION_DIRETOR
+            elif label in sections[current] and current != SECTION_FINANCEIRO:
+                # Campo repetido: começou o próximo bloco de pessoa
+                current = SECTION_ORDER[SECTION_ORDER.index(current) + 1]
+
+        # Mantém a primeira ocorrência de cada rótulo na seção
+        if label not in sections[current]:
+            sections[current][label] = clean_value(segment[colon + 1:])
+
+    return sections
+
+def extract_field(regex, body, field_name):
+    """Extrai um campo do corpo do e-mail usando regex e remove tags HTML e espaços extras."""
+    match = re.search(regex, body, re.DOTALL)  # re.DOTALL permite que o . capture também quebras de linha
+    if match:
+        # Remove tags HTML e espaços extras
+        cleaned_value = re.sub(r'<[^>]+>', '', match.group(1)).strip()  # Remove tags HTML e espaços
+        cleaned_value = re.sub(r'&nbsp;', ' ', cleaned_value)  # Substitui &nbsp; por espaço
+        cleaned_value = re.sub(r'\s+', ' ', cleaned_value)  # Remove espaços extras
+        return cleaned_value
+    else:
+        logger.debug("Campo '%s' não encontrado.", field_name)
+        return None
+
+def format_phone(phone):
+    """Formata o telefone no padrão +55DDDXXXXXXXXX."""
+    if not phone:
+        return None
+
+    # Remove todos os caracteres não numéricos
+    phone = DIGITS_RE.sub('', phone)
+
+    # Verifica se o telefone já começa com +55
+    if phone.startswith('55') and len(phone) == 13:
+        return f"+{phone}"  # Adiciona o sinal de + se já estiver no formato 55DDDXXXXXXXXX
+
+    # Verifica se o telefone tem 10 ou 11 dígitos (sem o +55)
+    if len(phone) == 10 or len(phone) == 11:
+        return f"+55{phone}"  # Adiciona o +55 no início
+
+    return None  # Retorna None se o telefone não puder ser formatado
+
+def format_cnpj(cnpj):
+    cnpj = DIGITS_RE.sub('', cnpj)  # Remove todos os caracteres não numéricos
+    if len(cnpj) == 14:  # Verifica se o CNPJ tem 14 dígitos
+        return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+    return cnpj  # Retorna o CNPJ sem formatação se não tiver 14 dígitos
+
+def build_contract_info(body):
+    """
+    Extrai do corpo do e-mail o dicionário salvo no cache do contrato.
+
+    Retorna (contrato, info) ou (contrato, None) se faltar algum campo obrigatório.
+    """
+    sections = parse_contract(body)
+    empresa = sections[SECTION_EMPRESA]
+    diretor = sections[SECTION_DIRETOR]
+    financeiro = sections[SECTION_FINANCEIRO]
+
+    contrato = empresa.get("Contrato")
+    razaoSocial = empresa.get("Razão Social")
+    cnpj = empresa.get("CNPJ")
+    modeloDeContrato = empresa.get("Modelo de Contrato")
+    consultor = empresa.get("Consultor")
+
+    # Verificar se todos os campos necessários foram extraídos
+    if not all([contrato, razaoSocial, cnpj, modeloDeContrato, consultor]):
+        return contrato, None
+
+    # Criar uma lista de e-mails (contratante, diretor e financeiro)
+    emails = [
+        value for value in (empresa.get("E-mail"), diretor.get("E-mail"), financeiro.get("E-mail"))
+        if value
+    ]
+
+    # Criar uma lista de telefones
+    phones = [
+        phone for phone in (format_phone(diretor.get("Telefone")), format_phone(financeiro.get("Telefone")))
+        if phone
+    ]
+
+    valorMensalidade = empresa.get("Valor da Mensalidade")
+    valorLicenca = empresa.get("Valor da Licença")
+    qtdCnpj = empresa.get("Qtd. CNPJ")
+    nomeDiretor = diretor.get("Nome")
+
+    info = {
+        "razaoSocial": razaoSocial,
+        "cnpj": format_cnpj(cnpj),  # CNPJ formatado
+        "modeloDeContrato": modeloDeContrato,
+        "consultor": consultor,
+        "emails": emails,  # Lista de e-mails
+        "phones": phones,  # Lista de telefones formatados
+        "valorMensalidade": valorMensalidade or None,  # Valor da mensalidade
+        "valorLicenca": valorLicenca or None,  # Valor da Licença
+        "qtdCnpj": qtdCnpj or None,  # Qtd. CNPJ
+        "diretor": nomeDiretor or None
+    }
+    return contrato, info
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+
+from log_config import setup_logging
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Banco SQLite com os contratos extraídos dos e-mails (substitui a pasta cache/)
+DB_PATH = os.getenv('CONTRACT_DB', 'contracts.db')
+
+# Pasta antiga com um <hash>.json por contrato, usada apenas na migração
+CACHE_DIR = 'cache'
+
+# Estados de processamento de um contrato:
+#   new -> company_created -> card_created -> notified
+#   synced: empresa e card já existiam no Bitrix, nada a fazer
+#   failed: erro em alguma etapa (motivo em "error"); é retomado na próxima execução
+STATUS_NEW = 'new'
+STATUS_COMPANY_CREATED = 'company_created'
+STATUS_CARD_CREATED = 'card_created'
+STATUS_NOTIFIED = 'notified'
+STATUS_SYNCED = 'synced'
+STATUS_FAILED = 'failed'
+
+# Quantas vezes um contrato com erro é tentado antes de ser deixado de lado
+MAX_ATTEMPTS = int(os.getenv('CONTRACT_MAX_ATTEMPTS', '5'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    hash TEXT PRIMARY KEY,
+    cnpj TEXT,
+    modelo TEXT,
+    status TEXT NOT NULL DEFAULT 'new',
+    company_id TEXT,
+    card_id TEXT,
+    notified_groups TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contracts_status ON contracts (status);
+CREATE INDEX IF NOT EXISTS idx_contracts_cnpj ON contracts (cnpj);
+
+-- Diário das chamadas que criam empresas e cards no Bitrix (ver journal.py)
+CREATE TABLE IF NOT EXISTS journal (
+    key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    method TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result_id TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+"""
+
+# Colunas adicionadas depois da primeira versão do banco
+UPGRADE_COLUMNS = {
+    "company_id": "TEXT",
+    "error": "TEXT",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "notified_groups": "TEXT",
+}
+
+_local = threading.local()
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def _upgrade_schema(conn):
+    """Adiciona colunas que não existiam em bancos criados por versões anteriores."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(contracts)")}
+    with conn:
+        for column, definition in UPGRADE_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE contracts ADD COLUMN {column} {definition}")
+
+def get_connection():
+    """Retorna a conexão SQLite da thread atual, criando o schema na primeira vez."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _upgrade_schema(conn)
+        _local.conn = conn
+    return conn
+
+def contract_exists(hash):
+    """Verifica se o contrato já está salvo."""
+    row = get_connection().execute("SELECT 1 FROM contracts WHERE hash = ?", (hash,)).fetchone()
+    return row is not None
+
+def save_contract(hash, data, status=STATUS_NEW):
+    """Salva um contrato novo. Retorna False se o hash já existir."""
+    now = _now()
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO contracts (hash, cnpj, modelo, status, data, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (hash, data.get("cnpj"), (data.get("modeloDeContrato") or "").strip(), status,
+             json.dumps(data, ensure_ascii=False), now, now)
+        )
+    return cursor.rowcount == 1
+
+def save_contracts(contracts, update=True):
+    """
+    Grava vários contratos em uma única transação: os novos entram como pendentes e os
+    já existentes têm apenas os dados atualizados (o estado de processamento é mantido),
+    a menos que update=False. Retorna (novos, atualizados).
+    """
+    now = _now()
+    created = 0
+    updated = 0
+    conn = get_connection()
+    with conn:
+        for hash, data in contracts:
+            cnpj = data.get("cnpj")
+            modelo = (data.get("modeloDeContrato") or "").strip()
+            data_json = json.dumps(data, ensure_ascii=False)
+
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO contracts (hash, cnpj, modelo, status, data, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (hash, cnpj, modelo, STATUS_NEW, data_json, now, now)
+            )
+            if cursor.rowcount == 1:
+                created += 1
+                continue
+            if not update:
+                continue
+
+            cursor = conn.execute(
+                "UPDATE contracts SET cnpj = ?, modelo = ?, data = ?, updated_at = ? WHERE hash = ? AND data != ?",
+                (cnpj, modelo, data_json, now, hash, data_json)
+            )
+            updated += cursor.rowcount
+    return created, updated
+
+def load_contract(hash):
+    """Carrega os dados de um contrato pelo hash. Retorna None se não existir."""
+    row = get_connection().execute("SELECT data FROM contracts WHERE hash = ?", (hash,)).fetchone()
+    return json.loads(row["data"]) if row else None
+
+def list_contracts(status=STATUS_NEW):
+    """Lista (hash, dados) dos contratos com o status informado, em ordem de chegada."""
+    rows = get_connection().execute(
+        "SELECT hash, data FROM contracts WHERE status = ? ORDER BY created_at, hash", (status,)
+    ).fetchall()
+    return [(row["hash"], json.loads(row["data"])) for row in rows]
+
+def get_contract(hash):
+    """
+    Carrega o contrato com seu estado de processamento.
+
+    Retorna um dicionário com status, company_id, card_id, error, attempts e data,
+    ou None se o hash não existir.
+    """
+    row = get_connection().execute(
+        "SELECT hash, status, company_id, card_id, error, attempts, data FROM contracts WHERE hash = ?", (hash,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    contract = dict(row)
+    contract["data"] = json.loads(contract["data"])
+    return contract
+
+def list_pending():
+    """Lista (hash, dados) dos contratos que ainda precisam ser processados no Bitrix."""
+    rows = get_connection().execute(
+        "SELECT hash, data FROM contracts "
+        "WHERE status IN (?, ?) OR (status = ? AND attempts < ?) "
+        "ORDER BY created_at, hash",
+        (STATUS_NEW, STATUS_COMPANY_CREATED, STATUS_FAILED, MAX_ATTEMPTS)
+    ).fetchall()
+    return [(row["hash"], json.loads(row["data"])) for row in rows]
+
+def list_unnotified():
+    """
+    Lista os contratos com card criado cujo e-mail de aviso ainda não foi enviado. Os
+    grupos de destinatários que já receberam o aviso vêm em "notified_groups".
+    """
+    rows = get_connection().execute(
+        "SELECT hash, card_id, notified_groups, data FROM contracts WHERE status = ? ORDER BY updated_at, hash",
+        (STATUS_CARD_CREATED,)
+    ).fetchall()
+
+    registros = []
+    for row in rows:
+        data = json.loads(row["data"])
+        registros.append({
+            "hash": row["hash"],
+            "razaoSocial": data.get("razaoSocial"),
+            "cnpj": data.get("cnpj"),
+            "card_id": row["card_id"],
+            "modeloDeContrato": data.get("modeloDeContrato"),
+            "notified_groups": set(filter(None, (row["notified_groups"] or "").split(",")))
+        })
+    return registros
+
+def mark_group_notified(hashes, group):
+    """Registra que o aviso dos contratos foi enviado ao grupo de destinatários."""
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "UPDATE contracts SET notified_groups = COALESCE(notified_groups || ',', '') || ? WHERE hash = ?",
+            [(group, hash) for hash in hashes]
+        )
+
+def set_state(hash, status, company_id=None, card_id=None):
+    """Avança o contrato para um novo estado, guardando os IDs criados no Bitrix."""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE contracts SET status = ?, company_id = COALESCE(?, company_id), "
+            "card_id = COALESCE(?, card_id), error = NULL, updated_at = ? WHERE hash = ?",
+            (status,
+             None if company_id is None else str(company_id),
+             None if card_id is None else str(card_id),
+             _now(), hash)
+        )
+
+def mark_failed(hash, reason):
+    """Marca o contrato como falho, guardando o motivo e contando a tentativa."""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE contracts SET status = ?, error = ?, attempts = attempts + 1, updated_at = ? WHERE hash = ?",
+            (STATUS_FAILED, str(reason), _now(), hash)
+        )
+
+def mark_company_missing(hash, reason):
+    """
+    Marca o contrato como falho e descarta a empresa salva (que não existe mais no
+    Bitrix), para que a próxima tentativa resolva a empresa de novo pelo CNPJ.
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE contracts SET status = ?, company_id = NULL, error = ?, attempts = attempts + 1, "
+            "updated_at = ? WHERE hash = ?",
+            (STATUS_FAILED, str(reason), _now(), hash)
+        )
+
+def migrate_json_cache(cache_dir=CACHE_DIR):
+    """Importa os arquivos <hash>.json da pasta de cache antiga para o banco."""
+    imported = 0
+    skipped = 0
+
+    for filename in sorted(os.listdir(cache_dir)):
+        if not filename.endswith('.json'):
+            continue
+
+        with open(os.path.join(cache_dir, filename), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        if save_contract(filename[:-5], data):
+            imported += 1
+        else:
+            skipped += 1
+
+    logger.info("Migração concluída: %d contratos importados, %d já existentes.", imported, skipped)
+    return imported
+
+if __name__ == "__main__":
+    setup_logging()
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        migrate_json_cache(sys.argv[2] if len(sys.argv) > 2 else CACHE_DIR)
+    else:
+        print("Uso: python contract_store.py migrate [pasta_do_cache]")
@@ -0,0 +1,103 @@
+import os
+import logging
+import time
+import imaplib2
+from dotenv import load_dotenv
+
+import metrics
+import rate_limiter
+from contract_store import list_pending
+from fetch_emails import iter_mailbox_contracts, EMAIL, PASSWORD, IMAP_SERVER, MAILBOX
+from run import notify_pending_records, process_contract
+from verify_data import load_company_index, reset_caches, COMPANY_INDEX_ENABLED
+from log_config import setup_logging
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo de cada IDLE; os servidores derrubam IDLEs com mais de 30 minutos, então
+# o comando é renovado antes disso (e a caixa é conferida a cada renovação)
+IDLE_TIMEOUT = int(os.getenv('IMAP_IDLE_TIMEOUT', str(29 * 60)))
+
+# Espera antes de reconectar após uma queda, dobrando a cada falha seguida
+RECONNECT_DELAY = float(os.getenv('IMAP_RECONNECT_DELAY', '5'))
+RECONNECT_MAX_DELAY = float(os.getenv('IMAP_RECONNECT_MAX_DELAY', '300'))
+
+def connect():
+    """Abre a conexão imaplib2, faz login e seleciona a caixa de entrada."""
+    logger.info("Conectando ao servidor IMAP (IDLE)...")
+    with metrics.timer("imap.connect"):
+        mail = imaplib2.IMAP4_SSL(IMAP_SERVER)
+    with metrics.timer("imap.login"):
+        mail.login(EMAIL, PASSWORD)
+        mail.select(MAILBOX)
+    return mail
+
+def sync_new_mail(mail):
+    """
+    Processa os e-mails que chegaram desde a marca d'água e os contratos que ainda
+    estão pendentes no banco, e avisa os cards criados. Cada despertar tem o seu
+    próprio relatório de métricas.
+    """
+    metrics.reset()
+    reset_caches()
+    if COMPANY_INDEX_ENABLED:
+        load_company_index()
+
+    processed = set()
+    for hash_name, data in iter_mailbox_contracts(mail):
+        process_contract(hash_name, data)
+        processed.add(hash_name)
+
+    # Contratos que falharam ou pararam no meio em rodadas anteriores
+    for hash_name, data in list_pending():
+        if hash_name not in processed:
+            process_contract(hash_name, data)
+
+    # Inclui os cards cujo aviso falhou em rodadas anteriores
+    notify_pending_records()
+    rate_limiter.report()
+    metrics.finish_run("daemon")
+
+def run_daemon():
+    """
+    Mantém uma conexão IDLE na caixa de entrada e processa cada contrato novo assim que
+    o servidor avisa a chegada do e-mail. Quedas de conexão são tratadas reconectando
+    com espera crescente; a marca d'água garante que nada chegado no intervalo se perca.
+    """
+    delay = RECONNECT_DELAY
+
+    while True:
+        mail = None
+        try:
+            mail = connect()
+            delay = RECONNECT_DELAY
+
+            # Recupera o que chegou enquanto o daemon estava desconectado
+            sync_new_mail(mail)
+
+            while True:
+                mail.idle(timeout=IDLE_TIMEOUT)
+                sync_new_mail(mail)
+
+        except KeyboardInterrupt:
+            logger.info("Encerrando o daemon...")
+            break
+
+        except Exception as e:
+            logger.warning("Conexão IMAP perdida: %s. Reconectando em %.0f segundos...", e, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+        finally:
+            if mail is not None:
+                try:
+                    mail.logout()
+                except Exception:
+                    pass
+
+if __name__ == "__main__":
+    setup_logging()
+    run_daemon()
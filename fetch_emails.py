@@ -1,216 +1,564 @@
 import imaplib
-import email
+import logging
 from email.header import decode_header
 import re
 import json
 import os
 import hashlib
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.parser import BytesHeaderParser
 from dotenv import load_dotenv
 
+import metrics
+import mail_mirror
+
+from contract_parser import build_contract_info
+from mail_body import extract_body
+from contract_store import contract_exists, save_contract, save_contracts
+
 # Carregar variáveis do arquivo .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configurações de conexão
 EMAIL = os.getenv('EMAIL')
 PASSWORD = os.getenv('PASSWORD')
 IMAP_SERVER = os.getenv('IMAP_SERVER')
 
-# Caminho para a pasta de cache
-CACHE_DIR = 'cache'
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
+# Arquivo com a marca d'água (UIDVALIDITY / último UID processado) da caixa de entrada
+IMAP_STATE_FILE = os.getenv('IMAP_STATE_FILE', 'imap_state.json')
+MAILBOX = 'inbox'
 
-def format_phone(phone):
-    """Formata o telefone no padrão +55DDDXXXXXXXXX."""
-    if not phone:
-        return None
+# Filtros aplicados direto no SEARCH do servidor IMAP
+SENDER_FILTER = 'contratos@setuptecnologia.com'
+SUBJECT_FILTER = os.getenv('IMAP_SUBJECT_FILTER')  # Opcional: trecho do assunto
+SINCE_DAYS = os.getenv('IMAP_SINCE_DAYS')  # Opcional: janela de dias para trás
 
-    # Remove todos os caracteres não numéricos
-    phone = re.sub(r'\D', '', phone)
+# Quantidade de mensagens pedidas em cada FETCH (um round-trip por lote)
+FETCH_BATCH_SIZE = int(os.getenv('IMAP_FETCH_BATCH_SIZE', '200'))
 
-    # Verifica se o telefone já começa com +55
-    if phone.startswith('55') and len(phone) == 13:
-        return f"+{phone}"  # Adiciona o sinal de + se já estiver no formato 55DDDXXXXXXXXX
+# Carga inicial (backfill_emails): quantas conexões IMAP baixam partes da caixa ao mesmo
+# tempo. O Gmail recusa mais de 15 conexões simultâneas por conta (contando outros
+# clientes de e-mail), por isso o valor é limitado a IMAP_MAX_CONNECTIONS.
+BACKFILL_CONNECTIONS = int(os.getenv('IMAP_BACKFILL_CONNECTIONS', '4'))
+MAX_CONNECTIONS = int(os.getenv('IMAP_MAX_CONNECTIONS', '10'))
 
-    # Verifica se o telefone tem 10 ou 11 dígitos (sem o +55)
-    if len(phone) == 10 or len(phone) == 11:
-        return f"+55{phone}"  # Adiciona o +55 no início
+def generate_hash(data):
+    """Gera um hash único baseado em uma string."""
+    return hashlib.md5(data.encode()).hexdigest()
 
-    return None  # Retorna None se o telefone não puder ser formatado
+def load_imap_state():
+    """Carrega a marca d'água do IMAP (UIDVALIDITY e último UID processado)."""
+    if not os.path.exists(IMAP_STATE_FILE):
+        return {}
 
-def extract_field(regex, body, field_name):
-    """Extrai um campo do corpo do e-mail usando regex e remove tags HTML e espaços extras."""
-    match = re.search(regex, body, re.DOTALL)  # re.DOTALL permite que o . capture também quebras de linha
-    if match:
-        # Remove tags HTML e espaços extras
-        cleaned_value = re.sub(r'<[^>]+>', '', match.group(1)).strip()  # Remove tags HTML e espaços
-        cleaned_value = re.sub(r'&nbsp;', ' ', cleaned_value)  # Substitui &nbsp; por espaço
-        cleaned_value = re.sub(r'\s+', ' ', cleaned_value)  # Remove espaços extras
-        return cleaned_value
-    else:
-        print(f"Campo '{field_name}' não encontrado.")
+    try:
+        with open(IMAP_STATE_FILE, 'r') as f:
+            return json.load(f).get(MAILBOX, {})
+    except (OSError, ValueError) as e:
+        logger.warning("Erro ao ler %s: %s. Ignorando estado salvo.", IMAP_STATE_FILE, e)
+        return {}
+
+def save_imap_state(uidvalidity, last_uid):
+    """Salva a marca d'água de forma atômica (arquivo temporário + rename)."""
+    state = {}
+    if os.path.exists(IMAP_STATE_FILE):
+        try:
+            with open(IMAP_STATE_FILE, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+    state[MAILBOX] = {"uidvalidity": uidvalidity, "last_uid": last_uid}
+
+    tmp_file = f"{IMAP_STATE_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, IMAP_STATE_FILE)
+
+def get_uidvalidity(mail):
+    """Retorna o UIDVALIDITY da caixa selecionada."""
+    _, data = mail.response('UIDVALIDITY')
+    if data and data[0]:
+        return int(data[0])
+
+    status, data = mail.status(MAILBOX, '(UIDVALIDITY)')
+    if status == 'OK' and data and data[0]:
+        match = re.search(rb'UIDVALIDITY (\d+)', data[0])
+        if match:
+            return int(match.group(1))
+    return None
+
+def build_search_criteria(last_uid):
+    """Monta os critérios do SEARCH para que o servidor filtre remetente, assunto e data."""
+    criteria = ['UID', f'{last_uid + 1}:*', 'FROM', f'"{SENDER_FILTER}"']
+
+    if SUBJECT_FILTER:
+        criteria += ['SUBJECT', f'"{SUBJECT_FILTER}"']
+
+    if SINCE_DAYS:
+        since = datetime.now() - timedelta(days=int(SINCE_DAYS))
+        # Formato exigido pelo IMAP: 01-Jan-2025 (sempre com mês em inglês)
+        months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+        criteria += ['SINCE', f'{since.day:02d}-{months[since.month - 1]}-{since.year}']
+
+    return criteria
+
+def search_new_uids(mail, last_uid):
+    """Busca no servidor apenas os UIDs do remetente desejado maiores que o último processado."""
+    status, messages = mail.uid('SEARCH', None, *build_search_criteria(last_uid))
+    if status != 'OK':
         return None
 
-def format_cnpj(cnpj):
-    cnpj = re.sub(r'\D', '', cnpj)  # Remove todos os caracteres não numéricos
-    if len(cnpj) == 14:  # Verifica se o CNPJ tem 14 dígitos
-        return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
-    return cnpj  # Retorna o CNPJ sem formatação se não tiver 14 dígitos
+    # "N:*" sempre devolve ao menos o maior UID da caixa, mesmo que seja menor que N
+    return sorted(uid for uid in (int(u) for u in messages[0].split()) if uid > last_uid)
 
-def generate_hash(data):
-    """Gera um hash único baseado em uma string."""
-    return hashlib.md5(data.encode()).hexdigest()
+def build_uid_set(uids):
+    """Compacta uma lista de UIDs em um sequence set do IMAP (ex: [1, 2, 3, 7] -> "1:3,7")."""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+
+    return ",".join(str(a) if a == b else f"{a}:{b}" for a, b in ranges)
+
+def iter_fetch_response(msg_data):
+    """
+    Percorre a resposta de um FETCH com várias mensagens, devolvendo (uid, dados) à
+    medida que cada literal é lido.
+    """
+    pending = None
+    for response_part in msg_data:
+        if isinstance(response_part, tuple):
+            if pending is not None:
+                yield pending
+            match = re.search(rb'UID (\d+)', response_part[0])
+            pending = (int(match.group(1)) if match else None, response_part[1])
+        elif pending is not None:
+            # Alguns servidores enviam o UID depois do literal: b' UID 123)'
+            if pending[0] is None:
+                match = re.search(rb'UID (\d+)', response_part)
+                if match:
+                    pending = (int(match.group(1)), pending[1])
+            yield pending
+            pending = None
+
+    if pending is not None:
+        yield pending
+
+def skip_message(skipped, reason, message, *args):
+    """
+    Registra um e-mail ignorado em DEBUG e conta o motivo em `skipped`; o resumo sai
+    uma única vez no fim da varredura, em vez de uma linha por e-mail.
+    """
+    logger.debug(message, *args)
+    if skipped is not None:
+        skipped[reason] += 1
+
+def fetch_candidates(mail, email_uids, skipped=None):
+    """
+    Baixa apenas os cabeçalhos From/Subject do lote (sem marcar como lido) e devolve os
+    UIDs cujo remetente é o desejado, antes de baixar qualquer corpo completo.
+    """
+    status, msg_data = mail.uid('FETCH', build_uid_set(email_uids), '(UID BODY.PEEK[HEADER.FIELDS (FROM SUBJECT)])')
+    if status != 'OK':
+        return None
 
-def process_emails():
-    """Processa todos os e-mails de 'contratos@setuptecnologia.com.br' e cria caches com base no ID do contrato."""
-    print("Conectando ao servidor IMAP...")
-    mail = imaplib.IMAP4_SSL(IMAP_SERVER)
+    candidates = []
+    for email_uid, header_bytes in iter_fetch_response(msg_data):
+        headers = BytesHeaderParser().parsebytes(header_bytes)
+        from_, encoding = decode_header(headers.get('From', ''))[0]
+        if isinstance(from_, bytes):
+            from_ = from_.decode(encoding if encoding else 'utf-8')
+        if SENDER_FILTER in from_:
+            candidates.append(email_uid)
+        else:
+            skip_message(skipped, "remetente", "E-mail UID %s não é do remetente desejado. Pulando...", email_uid)
+
+    return candidates
+
+def parse_message(raw_email, skipped=None):
+    """
+    Extrai (contrato, dados) de um e-mail de contrato. Os dados são None se faltar algum
+    campo obrigatório; retorna None se o e-mail não for de contrato (o motivo é contado
+    em `skipped`).
+    """
+    # Só os cabeçalhos e a primeira parte de texto são decodificados; anexos são ignorados
+    with metrics.timer("parse.mime"):
+        msg, body = extract_body(raw_email)
+
+    # Decodificando o remetente
+    from_, encoding = decode_header(msg.get('From'))[0]
+    if isinstance(from_, bytes):
+        from_ = from_.decode(encoding if encoding else 'utf-8')
+
+    # Verificando se o e-mail é do remetente desejado
+    if SENDER_FILTER not in from_:
+        skip_message(skipped, "remetente", "E-mail não é do remetente desejado. Pulando...")
+        return
+
+    # Extrair todos os campos em uma única passada pelo corpo
+    with metrics.timer("parse.contract"):
+        contrato, info_extraidas = build_contract_info(body)
+    if not contrato:
+        skip_message(skipped, "sem_contrato", "Campo 'Contrato' não encontrado.")
+        return
+
+    logger.debug("Contrato encontrado: %s", contrato)
+    return contrato, info_extraidas
+
+def process_message(raw_email, skipped=None):
+    """
+    Extrai as informações de um e-mail de contrato e salva no banco de contratos.
+
+    Retorna (hash, dados) do contrato salvo, ou None se o e-mail foi ignorado (o motivo
+    é contado em `skipped`).
+    """
+    metrics.increment("imap.messages")
+
+    parsed = parse_message(raw_email, skipped)
+    if parsed is None:
+        return
+    contrato, info_extraidas = parsed
+
+    # Verificar se o contrato já está salvo
+    hash_contrato = generate_hash(contrato)
+    if contract_exists(hash_contrato):
+        skip_message(skipped, "ja_salvo", "Contrato %s já salvo. Pulando...", contrato)
+        return
+
+    # Verificar se todos os campos necessários foram extraídos
+    if info_extraidas is None:
+        skip_message(skipped, "incompleto", "Dados incompletos no e-mail do contrato %s. Pulando...", contrato)
+        return
+
+    # Salvar as informações no banco de contratos (outra conexão do backfill pode ter
+    # salvo o mesmo contrato depois da verificação acima)
+    with metrics.timer("store.save"):
+        saved = save_contract(hash_contrato, info_extraidas)
+    if not saved:
+        skip_message(skipped, "ja_salvo", "Contrato %s já salvo. Pulando...", contrato)
+        return
+    metrics.increment("contracts.saved")
+
+    logger.info("Contrato %s salvo com hash %s.", contrato, hash_contrato)
+    return hash_contrato, info_extraidas
+
+def mirror_message(raw_email, uid, uidvalidity):
+    """Guarda o e-mail baixado no espelho local (MAIL_MIRROR_DIR), se estiver ativado."""
+    if not mail_mirror.MAIL_MIRROR_DIR:
+        return
 
     try:
-        # Login na conta
-        print("Fazendo login...")
-        mail.login(EMAIL, PASSWORD)
-
-        # Selecionando a caixa de entrada
-        mail.select('inbox')  # Seleciona a caixa de entrada
-
-        # Buscando TODOS os e-mails
-        print("Buscando todos os e-mails...")
-        status, messages = mail.search(None, 'ALL')  # 'ALL' busca todos os e-mails
-
-        if status == 'OK':
-            email_ids = messages[0].split()
-            print(f"Encontrados {len(email_ids)} e-mails.")
-
-            for email_id in email_ids:
-                print(f"\nProcessando e-mail ID: {email_id}...")
-                status, msg_data = mail.fetch(email_id, '(RFC822)')
-
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        # Parse do e-mail
-                        msg = email.message_from_bytes(response_part[1])
-
-                        # Decodificando o remetente
-                        from_, encoding = decode_header(msg.get('From'))[0]
-                        if isinstance(from_, bytes):
-                            from_ = from_.decode(encoding if encoding else 'utf-8')
-
-                        # Verificando se o e-mail é do remetente desejado
-                        if 'contratos@setuptecnologia.com' in from_:
-                            # Decodificando o assunto
-                            subject, encoding = decode_header(msg['Subject'])[0]
-                            if isinstance(subject, bytes):
-                                subject = subject.decode(encoding if encoding else 'utf-8')
-
-                            # Extraindo o corpo do e-mail
-                            body = ""
-                            if msg.is_multipart():
-                                # Iterar sobre as partes do e-mail
-                                for part in msg.walk():
-                                    content_type = part.get_content_type()
-                                    content_disposition = str(part.get("Content-Disposition"))
-
-                                    # Verificar se é texto simples ou HTML
-                                    if content_type == "text/plain" and "attachment" not in content_disposition:
-                                        body = part.get_payload(decode=True).decode()
-                                        break  # Prioriza texto simples
-                                    elif content_type == "text/html" and "attachment" not in content_disposition:
-                                        body = part.get_payload(decode=True).decode()
-                            else:
-                                # E-mail não é multipart, extrair diretamente
-                                body = msg.get_payload(decode=True).decode()
-
-                            # Extrair o ID do contrato
-                            contrato = extract_field(r'<b>Contrato:</b>\s*(.*?)\s*<br />', body, "Contrato")
-                            if not contrato:
-                                continue
-
-                            print(f"Contrato encontrado: {contrato}")  # Depuração: Exibir o contrato
-
-                            # Verificar se o cache já existe para esse contrato
-                            hash_contrato = generate_hash(contrato)
-                            cache_file = os.path.join(CACHE_DIR, f"{hash_contrato}.json")
-                            if os.path.exists(cache_file):
-                                print(f"Cache já existe para o contrato {contrato}. Pulando...")
-                                continue
-
-                            # Extrair outros campos
-                            softwareERP = extract_field(r'<b>Software ERP:</b>\s*(.*?)\s*<br />', body, "Software ERP")
-                            contrato = extract_field(r'<b>Contrato:</b>\s*(.*?)\s*<br />', body, "Contrato")
-                            modeloDeContrato = extract_field(r'<b>Modelo de Contrato:</b>\s*(.*?)\s*<br />', body, "Modelo de Contrato")
-                            data = extract_field(r'<b>Data:</b>\s*(.*?)\s*<br />', body, "Data")
-                            consultor = extract_field(r'<b>Consultor:</b>\s*(.*?)\s*<br />', body, "Consultor")
-                            razaoSocial = extract_field(r'<b>Razão Social:</b>\s*(.*?)\s*<br />', body, "Razão Social")
-                            cnpj = extract_field(r'<b>CNPJ:</b>\s*(.*?)\s*<br />', body, "CNPJ")
-                            nomeFantasia = extract_field(r'<b>Nome Fantasia:</b>\s*(.*?)\s*<br />', body, "Nome Fantasia")
-                            emailContratante = extract_field(r'<b>E-mail:</b>\s*(.*?)\s*<br />', body, "E-mail Contratante")
-                            valorLicenca = extract_field(r'Valor da Licença:\s*(.*?)\s*<br />', body, "Valor da Licença")
-                            tipoPagamento = extract_field(r'Tipo de Pagamento:\s*(.*?)\s*<br />', body, "Tipo de Pagamento")
-                            formaPagamento = extract_field(r'Forma de Pagamento:\s*(.*?)\s*<br />', body, "Forma de Pagamento")
-                            parcelas = extract_field(r'Parcelas:\s*(.*?)\s*<br />', body, "Parcelas")
-                            entradaPix = extract_field(r'Entrada pix:\s*(.*?)\s*<br />', body, "Entrada Pix")
-                            valorMensalidade = extract_field(r'Valor da Mensalidade:\s*(.*?)\s*<br />', body, "Valor da Mensalidade")
-                            primeiraMensalidade = extract_field(r'Primeira Mensalidade:\s*(.*?)\s*<br />', body, "Primeira Mensalidade")
-                            nomeDiretor = extract_field(r'Nome:\s*(.*?)\s*<br />', body, "Nome Diretor")
-                            emailDiretor = extract_field(r'E-mail:\s*(.*?)\s*<br />', body, "E-mail Diretor")
-                            telefoneDiretor = format_phone(extract_field(r'Telefone:\s*(.*?)\s*<br />', body, "Telefone Diretor"))
-                            cpfDiretor = extract_field(r'CPF:\s*(.*?)\s*<br />', body, "CPF Diretor")
-                            nomeFinanceiro = extract_field(r'Nome:\s*(.*?)\s*<br />', body, "Nome Financeiro")
-                            emailFinanceiro = extract_field(r'E-mail:\s*(.*?)\s*<br />', body, "E-mail Financeiro")
-                            telefoneFinanceiro = format_phone(extract_field(r'Telefone:\s*(.*?)\s*<br />', body, "Telefone Financeiro"))
-                            qtdCnpj = extract_field(r'Qtd. CNPJ:\s*(.*?)\s*<br />', body, "Qtd. CNPJ")  # Novo campo
-
-                            # Verificar se todos os campos necessários foram extraídos
-                            if not all([razaoSocial, cnpj, modeloDeContrato, consultor]):
-                                print("Dados incompletos no e-mail. Pulando...")
-                                continue
-
-                            # Formatar o CNPJ
-                            cnpj = format_cnpj(cnpj)
-
-                            # Criar uma lista de e-mails
-                            emails = [emailContratante, emailDiretor, emailFinanceiro]
-
-                            # Criar uma lista de telefones
-                            phones = []
-                            if telefoneDiretor:
-                                phones.append(telefoneDiretor)
-                            if telefoneFinanceiro:
-                                phones.append(telefoneFinanceiro)
-
-                            # Dicionário para armazenar as informações
-                            info_extraidas = {
-                                "razaoSocial": razaoSocial.strip(),  # Remove espaços extras
-                                "cnpj": cnpj,  # CNPJ formatado
-                                "modeloDeContrato": modeloDeContrato.strip(),
-                                "consultor": consultor.strip(),
-                                "emails": emails,  # Lista de e-mails
-                                "phones": phones,  # Lista de telefones formatados
-                                "valorMensalidade": valorMensalidade.strip() if valorMensalidade else None,  # Valor da mensalidade
-                                "valorLicenca": valorLicenca.strip() if valorLicenca else None,  # Valor da Licença
-                                "qtdCnpj": qtdCnpj.strip() if qtdCnpj else None,  # Novo campo: Qtd. CNPJ
-                                "diretor": nomeDiretor.strip() if nomeDiretor else None
-                            }
-
-                            # Salvar as informações em um arquivo de cache
-                            with open(cache_file, 'w') as f:
-                                json.dump(info_extraidas, f)
-
-                            print(f"Cache salvo em: {cache_file}")
-                        else:
-                            print("E-mail não é do remetente desejado. Pulando...")
-        else:
-            print("Nenhum e-mail encontrado ou erro na busca.")
+        with metrics.timer("mirror.store"):
+            mail_mirror.store_message(raw_email, uid, uidvalidity)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Não foi possível guardar o e-mail UID %s no espelho: %s", uid, e)
+
+def iter_batch_contracts(mail, batch, skipped=None, uidvalidity=None):
+    """
+    Baixa um lote de UIDs (cabeçalhos e, dos candidatos, a mensagem inteira) e devolve
+    (hash, dados) de cada contrato salvo. Cada mensagem baixada também vai para o
+    espelho local, mesmo que a extração falhe. O valor de retorno do gerador
+    (`yield from`) é False se o servidor recusou algum FETCH do lote.
+    """
+    with metrics.timer("imap.fetch_headers"):
+        candidates = fetch_candidates(mail, batch, skipped)
+    if candidates is None:
+        logger.error("Erro ao baixar os cabeçalhos do lote. Interrompendo para tentar novamente na próxima execução.")
+        return False
+
+    if candidates:
+        with metrics.timer("imap.fetch"):
+            status, msg_data = mail.uid('FETCH', build_uid_set(candidates), '(UID RFC822)')
+        if status != 'OK':
+            logger.error("Erro ao baixar os e-mails do lote. Interrompendo para tentar novamente na próxima execução.")
+            return False
+
+        for email_uid, raw_email in iter_fetch_response(msg_data):
+            logger.debug("Processando e-mail UID: %s...", email_uid)
+            mirror_message(raw_email, email_uid, uidvalidity)
+            try:
+                contract = process_message(raw_email, skipped)
+            except Exception as e:
+                logger.error("Erro ao processar o e-mail UID %s: %s", email_uid, e)
+                if skipped is not None:
+                    skipped["erro"] += 1
+                continue
+
+            if contract is not None:
+                yield contract
+
+    return True
+
+def resolve_last_uid(uidvalidity, full_resync=False):
+    """Retorna o UID a partir do qual a caixa deve ser lida (0 = caixa inteira)."""
+    state = load_imap_state()
+    last_uid = state.get("last_uid", 0)
+
+    if full_resync:
+        logger.info("Ressincronização completa solicitada.")
+        last_uid = 0
+    elif state and state.get("uidvalidity") != uidvalidity:
+        logger.warning("UIDVALIDITY mudou (%s -> %s). Ressincronizando a caixa inteira...", state.get('uidvalidity'), uidvalidity)
+        last_uid = 0
+
+    return last_uid
+
+def iter_mailbox_contracts(mail, full_resync=False):
+    """
+    Processa os e-mails novos de 'contratos@setuptecnologia.com.br' em uma conexão IMAP já
+    autenticada e com a caixa selecionada, salvando os contratos com base no ID do contrato
+    e devolvendo (hash, dados) de cada contrato novo assim que ele é salvo.
+
+    Apenas os UIDs maiores que a marca d'água salva em IMAP_STATE_FILE são baixados. Se o
+    UIDVALIDITY da caixa mudar (ou full_resync=True), a caixa inteira é reprocessada.
+    A marca d'água só avança quando o lote inteiro foi entregue.
+    """
+    uidvalidity = get_uidvalidity(mail)
+    last_uid = resolve_last_uid(uidvalidity, full_resync)
+
+    # Buscando apenas os e-mails novos do remetente desejado
+    logger.info("Buscando e-mails de %s com UID maior que %s...", SENDER_FILTER, last_uid)
+    with metrics.timer("imap.search"):
+        email_uids = search_new_uids(mail, last_uid)
+
+    if email_uids is not None:
+        logger.info("Encontrados %d e-mails novos.", len(email_uids))
+        skipped = Counter()
+
+        try:
+            for start in range(0, len(email_uids), FETCH_BATCH_SIZE):
+                batch = email_uids[start:start + FETCH_BATCH_SIZE]
+                logger.debug("Processando lote de %d e-mails (UIDs %s a %s)...", len(batch), batch[0], batch[-1])
+
+                if not (yield from iter_batch_contracts(mail, batch, skipped, uidvalidity)):
+                    break
+
+                last_uid = batch[-1]
+        finally:
+            # Salva o progresso mesmo em caso de erro no meio do lote
+            save_imap_state(uidvalidity, last_uid)
+            if skipped:
+                logger.info("%d e-mails ignorados: %s", sum(skipped.values()), dict(skipped))
+    else:
+        logger.warning("Nenhum e-mail encontrado ou erro na busca.")
+
+def connect_imap():
+    """Abre uma conexão IMAP, faz login e seleciona a caixa de entrada."""
+    with metrics.timer("imap.connect"):
+        mail = imaplib.IMAP4_SSL(IMAP_SERVER)
+
+    try:
+        with metrics.timer("imap.login"):
+            # Login na conta
+            logger.debug("Fazendo login...")
+            mail.login(EMAIL, PASSWORD)
+
+            # Selecionando a caixa de entrada
+            mail.select(MAILBOX)  # Seleciona a caixa de entrada
+    except Exception:
+        mail.logout()
+        raise
+
+    return mail
+
+def iter_new_contracts(full_resync=False):
+    """
+    Conecta ao IMAP, processa os e-mails novos (iter_mailbox_contracts) e fecha a conexão,
+    devolvendo (hash, dados) de cada contrato novo assim que ele é salvo.
+    """
+    logger.info("Conectando ao servidor IMAP...")
+    try:
+        mail = connect_imap()
+    except Exception as e:
+        logger.error("Erro: %s", e)
+        return
+
+    try:
+        yield from iter_mailbox_contracts(mail, full_resync)
 
     except Exception as e:
-        print(f"Erro: {e}")
+        logger.error("Erro: %s", e)
 
     finally:
         # Fechando a conexão
-        print(f"\nFechando conexão...\n\n")
-        print(70*"-")
-        print(f"\n\n")
+        logger.info("Fechando conexão IMAP.")
+        mail.logout()
+
+def process_emails(full_resync=False):
+    """Salva os contratos dos e-mails novos e retorna quantos foram salvos."""
+    return sum(1 for _ in iter_new_contracts(full_resync))
+
+def split_shards(uids, count):
+    """Divide a lista ordenada de UIDs em até `count` faixas contíguas de tamanho parecido."""
+    count = max(1, min(count, len(uids)))
+    size, extra = divmod(len(uids), count)
+    shards = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(uids[start:end])
+        start = end
+    return shards
+
+def fetch_shard(index, shard, uidvalidity, progress, skipped):
+    """
+    Baixa uma faixa de UIDs em uma conexão IMAP própria, em lotes de FETCH_BATCH_SIZE.
+    progress[index] guarda o último UID do último lote concluído. Retorna quantos
+    contratos foram salvos.
+    """
+    mail = connect_imap()
+    saved = 0
+    try:
+        if get_uidvalidity(mail) != uidvalidity:
+            logger.error("UIDVALIDITY mudou durante a carga (parte %d). Interrompendo.", index + 1)
+            return saved
+
+        logger.debug("Parte %d: %d e-mails (UIDs %s a %s).", index + 1, len(shard), shard[0], shard[-1])
+        for start in range(0, len(shard), FETCH_BATCH_SIZE):
+            batch = shard[start:start + FETCH_BATCH_SIZE]
+
+            # Percorre o lote à mão para ler o valor de retorno do gerador (False = erro)
+            batch_contracts = iter_batch_contracts(mail, batch, skipped, uidvalidity)
+            while True:
+                try:
+                    next(batch_contracts)
+                except StopIteration as done:
+                    completed = done.value
+                    break
+                saved += 1
+
+            if not completed:
+                break
+            progress[index] = batch[-1]
+    finally:
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+    return saved
+
+def backfill_watermark(shards, progress, last_uid):
+    """
+    Retorna a marca d'água segura após a carga: o maior UID até o qual todas as faixas
+    anteriores foram concluídas (uma faixa interrompida segura as seguintes, que são
+    relidas na próxima execução; os contratos já salvos são ignorados).
+    """
+    for shard, done in zip(shards, progress):
+        if done is not None:
+            last_uid = done
+        if done != shard[-1]:
+            break
+    return last_uid
+
+def backfill_emails(connections=None, full_resync=False):
+    """
+    Carga inicial da caixa (primeira execução, UIDVALIDITY novo ou full_resync): divide os
+    UIDs novos em faixas contíguas e baixa cada faixa em uma conexão IMAP própria, em
+    paralelo. Os contratos vão para o mesmo banco de process_emails(); retorna quantos
+    foram salvos.
+    """
+    connections = min(max(1, connections or BACKFILL_CONNECTIONS), MAX_CONNECTIONS)
+
+    logger.info("Conectando ao servidor IMAP...")
+    try:
+        mail = connect_imap()
+    except Exception as e:
+        logger.error("Erro: %s", e)
+        return 0
+
+    try:
+        uidvalidity = get_uidvalidity(mail)
+        last_uid = resolve_last_uid(uidvalidity, full_resync)
+
+        logger.info("Buscando e-mails de %s com UID maior que %s...", SENDER_FILTER, last_uid)
+        with metrics.timer("imap.search"):
+            email_uids = search_new_uids(mail, last_uid)
+    finally:
+        # A conexão da busca é fechada para não contar no limite de conexões da conta
         mail.logout()
 
-process_emails()
\ No newline at end of file
+    if email_uids is None:
+        logger.warning("Nenhum e-mail encontrado ou erro na busca.")
+        return 0
+    if not email_uids:
+        logger.info("Encontrados 0 e-mails novos.")
+        return 0
+
+    shards = split_shards(email_uids, connections)
+    logger.info("Encontrados %d e-mails novos. Baixando em %d conexões...", len(email_uids), len(shards))
+
+    progress = [None] * len(shards)
+    skipped = [Counter() for _ in shards]
+    saved = 0
+    try:
+        with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="imap") as executor:
+            futures = [
+                executor.submit(fetch_shard, i, shard, uidvalidity, progress, skipped[i])
+                for i, shard in enumerate(shards)
+            ]
+            for i, future in enumerate(futures):
+                try:
+                    saved += future.result()
+                except Exception as e:
+                    logger.error("Erro na parte %d da carga: %s", i + 1, e)
+    finally:
+        # Salva o progresso mesmo em caso de erro em alguma das conexões
+        save_imap_state(uidvalidity, backfill_watermark(shards, progress, last_uid))
+        total_skipped = sum(skipped, Counter())
+        if total_skipped:
+            logger.info("%d e-mails ignorados: %s", sum(total_skipped.values()), dict(total_skipped))
+
+    logger.info("Carga concluída: %d contratos salvos.", saved)
+    return saved
+
+def reparse_mirror():
+    """
+    Refaz os contratos a partir do espelho local (MAIL_MIRROR_DIR), sem acessar o IMAP:
+    usado depois de mudar a extração dos campos. Contratos já salvos têm os dados
+    atualizados e mantêm o estado de processamento; os que antes não eram extraídos
+    entram como pendentes. Retorna (novos, atualizados).
+    """
+    if not mail_mirror.MAIL_MIRROR_DIR:
+        logger.error("MAIL_MIRROR_DIR não configurado. Nada a reprocessar.")
+        return 0, 0
+
+    skipped = Counter()
+    contracts = {}
+    messages = 0
+
+    for digest, raw_email in mail_mirror.iter_messages():
+        messages += 1
+        try:
+            parsed = parse_message(raw_email, skipped)
+        except Exception as e:
+            logger.error("Erro ao processar a mensagem %s do espelho: %s", digest, e)
+            skipped["erro"] += 1
+            continue
+
+        if parsed is None:
+            continue
+        contrato, info_extraidas = parsed
+        if info_extraidas is None:
+            skip_message(skipped, "incompleto", "Dados incompletos no e-mail do contrato %s. Pulando...", contrato)
+            continue
+
+        # Como no fetch, vale o primeiro e-mail de cada contrato
+        contracts.setdefault(generate_hash(contrato), info_extraidas)
+
+    with metrics.timer("store.save"):
+        created, updated = save_contracts(contracts.items())
+    metrics.increment("mirror.messages", messages)
+
+    if skipped:
+        logger.info("%d e-mails ignorados: %s", sum(skipped.values()), dict(skipped))
+    logger.info("Espelho reprocessado: %d mensagens, %d contratos novos, %d atualizados.", messages, created, updated)
+    return created, updated
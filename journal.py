@@ -0,0 +1,105 @@
+import os
+import time
+import logging
+from dotenv import load_dotenv
+
+import metrics
+from contract_store import get_connection
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Diário (write-ahead) das chamadas que criam algo no Bitrix. Antes de cada
+# crm.company.add / crm.item.add fica gravada a intenção ("pending"); com a resposta,
+# o ID criado ("done"). Na retomada:
+#   done    -> o ID é reaproveitado sem nenhuma consulta ou nova criação;
+#   pending -> o processo caiu (ou a requisição expirou) sem saber se o Bitrix gravou:
+#              o registro é procurado uma vez e só é criado de novo se não existir.
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+
+# Folga (segundos) entre o relógio local e o do Bitrix ao procurar registros criados
+# depois de uma intenção pendente
+JOURNAL_CLOCK_SKEW = float(os.getenv('JOURNAL_CLOCK_SKEW', '300'))
+
+def journal_key(contract_hash, method):
+    """Chave de idempotência de uma chamada: uma por contrato e método."""
+    return f"{contract_hash}:{method}"
+
+def get_entry(key):
+    """Retorna a entrada do diário (status, result_id, started_at...) ou None."""
+    row = get_connection().execute(
+        "SELECT key, hash, method, status, result_id, started_at FROM journal WHERE key = ?", (key,)
+    ).fetchone()
+    return dict(row) if row else None
+
+def begin(key, contract_hash, method):
+    """Grava a intenção da chamada antes de enviá-la ao Bitrix."""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO journal (key, hash, method, status, result_id, started_at, finished_at) "
+            "VALUES (?, ?, ?, ?, NULL, ?, NULL)",
+            (key, contract_hash, method, STATUS_PENDING, time.time())
+        )
+
+def settle(key, result_id):
+    """
+    Registra o resultado da chamada: com um ID a entrada fica concluída; sem ID (o Bitrix
+    recusou, ou o registro não foi encontrado) a intenção é descartada. Retorna result_id.
+    """
+    conn = get_connection()
+    with conn:
+        if result_id:
+            conn.execute(
+                "UPDATE journal SET status = ?, result_id = ?, finished_at = ? WHERE key = ?",
+                (STATUS_DONE, str(result_id), time.time(), key)
+            )
+        else:
+            conn.execute("DELETE FROM journal WHERE key = ?", (key,))
+    return result_id
+
+def replayed(entry):
+    """Retorna o ID de uma chamada já concluída, sem nova consulta ao Bitrix."""
+    metrics.increment("journal.replayed")
+    logger.info("🔁 %s já concluído anteriormente (ID %s).", entry["method"], entry["result_id"])
+    return entry["result_id"]
+
+def recover_since(entry):
+    """Início da janela (timestamp) em que o registro de uma intenção pendente é procurado."""
+    metrics.increment("journal.recovered")
+    logger.warning("⚠️ %s ficou sem resposta em uma execução anterior. Procurando no Bitrix...", entry["method"])
+    return entry["started_at"] - JOURNAL_CLOCK_SKEW
+
+def recovered(entry, result_id):
+    """Registra o resultado da procura de uma intenção pendente (ver settle)."""
+    if result_id:
+        logger.info("🔁 %s encontrado no Bitrix (ID %s).", entry["method"], result_id)
+    return settle(entry["key"], result_id)
+
+def resume(key, recover):
+    """
+    Retoma uma chamada já registrada no diário, dentro das etapas de um fluxo
+    (contract_flow, com `yield from`). Retorna o ID de uma chamada concluída; para uma
+    intenção pendente, produz a chamada recover(desde) que procura o registro no
+    Bitrix. Retorna None se não houver entrada ou se o registro não existir (a chamada
+    pode então ser feita de novo).
+    """
+    entry = get_entry(key)
+    if entry is None:
+        return None
+
+    if entry["status"] == STATUS_DONE:
+        return replayed(entry)
+    return recovered(entry, (yield recover(recover_since(entry))))
+
+def run_once(key, contract_hash, method, call):
+    """
+    Produz a chamada que cria o registro (e recebe o ID criado, ou None) entre o
+    registro da intenção e o do resultado. Se a chamada levantar uma exceção (ex.:
+    timeout) a intenção continua pendente e é resolvida por resume() na próxima tentativa.
+    """
+    begin(key, contract_hash, method)
+    return settle(key, (yield call))
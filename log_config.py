@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import logging
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+# Nível mínimo das mensagens (DEBUG mostra uma linha por e-mail / chamada ao Bitrix)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+# "text" (padrão) ou "json" (um objeto por linha, para coletores de log)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s [%(contract)s] %(message)s"
+
+# Hash do contrato em processamento; segue a thread / tarefa asyncio atual
+_contract = contextvars.ContextVar('contract', default=None)
+
+@contextmanager
+def contract_context(contract_id):
+    """Marca as mensagens registradas dentro do bloco com o ID do contrato."""
+    token = _contract.set(contract_id)
+    try:
+        yield
+    finally:
+        _contract.reset(token)
+
+class ContractFilter(logging.Filter):
+    """Preenche record.contract com o contrato em processamento ("-" fora de um contrato)."""
+
+    def filter(self, record):
+        record.contract = _contract.get() or "-"
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por mensagem."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "contract", "-") != "-":
+            entry["contract"] = record.contract
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def setup_logging(level=None, json_format=None):
+    """Configura o logging da aplicação (chamado pelos pontos de entrada)."""
+    level = (level or LOG_LEVEL).upper()
+    json_format = LOG_FORMAT.lower() == "json" if json_format is None else json_format
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(ContractFilter())
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+    # Bibliotecas HTTP registram cada requisição em INFO
+    for name in ("httpx", "httpcore", "urllib3"):
+        logging.getLogger(name).setLevel(logging.WARNING)
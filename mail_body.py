@@ -0,0 +1,123 @@
+import base64
+import quopri
+from email import policy
+from email.parser import BytesHeaderParser
+
+# Só os cabeçalhos de cada parte passam pelo parser; o corpo das partes é localizado
+# por índices no e-mail bruto, então anexos nunca são copiados nem decodificados.
+HEADER_PARSER = BytesHeaderParser(policy=policy.compat32)
+
+def find_header_end(raw, start=0, end=None):
+    """Retorna (fim_dos_cabeçalhos, início_do_corpo) de uma parte do e-mail bruto."""
+    end = len(raw) if end is None else end
+    crlf = raw.find(b'\r\n\r\n', start, end)
+    lf = raw.find(b'\n\n', start, end)
+
+    if crlf != -1 and (lf == -1 or crlf <= lf):
+        return crlf, crlf + 4
+    if lf != -1:
+        return lf, lf + 2
+    return end, end
+
+def parse_headers(raw, start=0, end=None):
+    """Faz o parse apenas do bloco de cabeçalhos; devolve (cabeçalhos, início_do_corpo)."""
+    header_end, body_start = find_header_end(raw, start, end)
+    return HEADER_PARSER.parsebytes(raw[start:header_end]), body_start
+
+def decode_part(raw, headers, start, end):
+    """Decodifica o conteúdo de uma parte de texto conforme o Content-Transfer-Encoding."""
+    payload = raw[start:end]
+    encoding = str(headers.get('Content-Transfer-Encoding', '')).strip().lower()
+
+    if encoding == 'base64':
+        payload = base64.b64decode(payload)
+    elif encoding == 'quoted-printable':
+        payload = quopri.decodestring(payload)
+
+    charset = headers.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+def iter_parts(raw, boundary, start, end):
+    """Devolve (início, fim) de cada parte de um multipart, sem copiar o conteúdo."""
+    delimiter = b'\n--' + boundary.encode()
+
+    # O primeiro delimitador pode estar logo no início do corpo
+    if raw.startswith(delimiter[1:], start):
+        pos = start
+    else:
+        pos = raw.find(delimiter, start - 1, end)
+        if pos == -1:
+            return
+        pos += 1
+
+    while True:
+        line_end = raw.find(b'\n', pos, end)
+        if line_end == -1 or raw.startswith(b'--', pos + len(delimiter) - 1):
+            return  # Delimitador final "--boundary--"
+
+        next_pos = raw.find(delimiter, line_end, end)
+        part_end = end if next_pos == -1 else next_pos
+        if part_end > line_end and raw[part_end - 1:part_end] == b'\r':
+            part_end -= 1
+
+        yield line_end + 1, part_end
+
+        if next_pos == -1:
+            return
+        pos = next_pos + 1
+
+def find_text_part(raw, headers, start, end, found):
+    """
+    Percorre as partes recursivamente. Para na primeira parte text/plain; guarda a
+    primeira text/html em found['html'] caso não exista texto simples.
+    """
+    content_type = headers.get_content_type()
+    disposition = str(headers.get('Content-Disposition', ''))
+
+    if content_type.startswith('multipart/'):
+        boundary = headers.get_param('boundary')
+        if not boundary:
+            return None
+
+        for part_start, part_end in iter_parts(raw, boundary, start, end):
+            part_headers, body_start = parse_headers(raw, part_start, part_end)
+            result = find_text_part(raw, part_headers, body_start, part_end, found)
+            if result is not None:
+                return result
+        return None
+
+    if 'attachment' in disposition:
+        return None
+
+    if content_type == 'text/plain':
+        return (headers, start, end)
+
+    if content_type == 'text/html' and 'html' not in found:
+        found['html'] = (headers, start, end)
+
+    return None
+
+def extract_body(raw_email):
+    """
+    Extrai o corpo de texto do e-mail bruto, priorizando text/plain e usando text/html
+    na falta dele. Só a parte escolhida é decodificada.
+
+    Retorna (cabeçalhos, corpo).
+    """
+    headers, body_start = parse_headers(raw_email)
+
+    if headers.get_content_maintype() != 'multipart':
+        return headers, decode_part(raw_email, headers, body_start, len(raw_email))
+
+    found = {}
+    result = find_text_part(raw_email, headers, body_start, len(raw_email), found)
+    if result is None:
+        result = found.get('html')
+    if result is None:
+        return headers, ""
+
+    part_headers, start, end = result
+    return headers, decode_part(raw_email, part_headers, start, end)
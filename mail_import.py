@@ -0,0 +1,178 @@
+import os
+import mmap
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+
+import metrics
+from fetch_emails import generate_hash, parse_message
+from contract_store import save_contracts
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Importação de exportações da caixa de entrada (mbox, Maildir ou arquivos .eml), sem
+# IMAP. Os processos recebem só a localização de cada mensagem (arquivo, início, fim)
+# e leem o conteúdo por conta própria; arquivos mbox são mapeados em memória (mmap),
+# então nem o processo principal nem os workers carregam o arquivo inteiro.
+
+# Processos que extraem os contratos em paralelo (padrão: um por CPU)
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS') or 0) or os.cpu_count() or 1
+
+# Contratos gravados por transação no banco
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+
+# Mensagens enviadas de uma vez para cada processo
+IMPORT_CHUNK_SIZE = 64
+
+def iter_mbox(path):
+    """Localiza as mensagens de um arquivo mbox: (arquivo, início, fim) de cada uma."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            size = len(data)
+            while start < size:
+                # Cada mensagem começa por uma linha "From remetente data", que não faz parte dela
+                body = data.find(b'\n', start) + 1
+                if body == 0:
+                    break
+                next_message = data.find(b'\nFrom ', body)
+                end = size if next_message == -1 else next_message + 1
+                yield path, body, end
+                start = end
+
+def iter_maildir(path):
+    """Localiza as mensagens de um Maildir (subpastas cur/ e new/)."""
+    for folder in ('cur', 'new'):
+        folder_path = os.path.join(path, folder)
+        if os.path.isdir(folder_path):
+            for filename in sorted(os.listdir(folder_path)):
+                yield os.path.join(folder_path, filename), 0, None
+
+def iter_eml_dir(path):
+    """Localiza os arquivos .eml de uma pasta (incluindo subpastas)."""
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith('.eml'):
+                yield os.path.join(root, filename), 0, None
+
+def check_export(path):
+    """
+    Confere se o caminho é uma exportação que iter_export sabe ler (pasta, arquivo .eml
+    ou arquivo mbox, que começa por uma linha "From "). Retorna o motivo do problema,
+    ou None se o caminho for válido.
+    """
+    if not os.path.exists(path):
+        return "arquivo ou pasta não encontrado"
+    if os.path.isdir(path) or path.lower().endswith('.eml'):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(5)
+    except OSError as e:
+        return str(e)
+
+    if head and head != b'From ':
+        return "não é um arquivo .eml nem mbox (a primeira linha não começa por \"From \")"
+    return None
+
+def iter_export(path):
+    """Detecta o formato da exportação (Maildir, pasta de .eml, .eml ou mbox) e localiza as mensagens."""
+    if os.path.isdir(path):
+        if os.path.isdir(os.path.join(path, 'cur')) or os.path.isdir(os.path.join(path, 'new')):
+            return iter_maildir(path)
+        return iter_eml_dir(path)
+
+    if path.lower().endswith('.eml'):
+        return iter([(path, 0, None)])
+    return iter_mbox(path)
+
+# mmap de cada arquivo mbox já aberto pelo processo (reaproveitado entre mensagens)
+_mbox_maps = {}
+
+def read_message(path, start=0, end=None):
+    """Lê o conteúdo bruto de uma mensagem localizada por iter_export."""
+    if end is None:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    data = _mbox_maps.get(path)
+    if data is None:
+        with open(path, 'rb') as f:
+            data = _mbox_maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return data[start:end]
+
+def parse_located_message(location):
+    """
+    Executado nos processos do pool: lê e extrai uma mensagem. Retorna
+    (contrato, dados, motivo), com motivo preenchido quando a mensagem foi ignorada.
+    """
+    skipped = Counter()
+    try:
+        parsed = parse_message(read_message(*location), skipped)
+    except Exception as e:
+        return None, None, f"erro: {e}"
+
+    if parsed is None:
+        return None, None, next(iter(skipped), "ignorado")
+    contrato, info_extraidas = parsed
+    if info_extraidas is None:
+        return contrato, None, "incompleto"
+    return contrato, info_extraidas, None
+
+def import_export(paths, workers=None):
+    """
+    Importa os contratos de exportações mbox / Maildir / .eml para o banco de contratos,
+    extraindo as mensagens em um pool de processos. Como no fetch, vale o primeiro e-mail
+    de cada contrato e contratos já salvos não são alterados. Retorna quantos foram salvos.
+    """
+    workers = IMPORT_WORKERS if workers is None else max(1, workers)
+    locations = [location for path in paths for location in iter_export(path)]
+    logger.info("Importando %d mensagens de %d arquivo(s) com %d processos...", len(locations), len(paths), workers)
+
+    skipped = Counter()
+    seen = set()
+    batch = []
+    created = 0
+
+    with metrics.timer("import.parse"), ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(parse_located_message, locations, chunksize=IMPORT_CHUNK_SIZE)
+        for location, (contrato, info_extraidas, reason) in zip(locations, results):
+            if reason is not None:
+                if reason.startswith("erro"):
+                    logger.error("Erro ao processar a mensagem de %s: %s", location[0], reason)
+                    reason = "erro"
+                skipped[reason] += 1
+                continue
+
+            hash_contrato = generate_hash(contrato)
+            if hash_contrato in seen:
+                skipped["duplicado"] += 1
+                continue
+            seen.add(hash_contrato)
+
+            batch.append((hash_contrato, info_extraidas))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                with metrics.timer("store.save"):
+                    created += save_contracts(batch, update=False)[0]
+                batch = []
+
+    if batch:
+        with metrics.timer("store.save"):
+            created += save_contracts(batch, update=False)[0]
+
+    metrics.increment("import.messages", len(locations))
+    metrics.increment("contracts.saved", created)
+
+    if skipped:
+        logger.info("%d e-mails ignorados: %s", sum(skipped.values()), dict(skipped))
+    logger.info("Importação concluída: %d contratos novos de %d mensagens.", created, len(locations))
+    return created
@@ -0,0 +1,109 @@
+import os
+import gzip
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+
+from mail_body import parse_headers
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cópia local dos e-mails de contrato baixados do IMAP, para reprocessar os contratos
+# (ex.: depois de mudar a extração dos campos) sem baixar tudo de novo. Cada mensagem
+# é gravada compactada em <MAIL_MIRROR_DIR>/<sha256[:2]>/<sha256>.eml.gz; o índice
+# (UID, UIDVALIDITY, Message-ID) fica em <MAIL_MIRROR_DIR>/index.db.
+MAIL_MIRROR_DIR = os.getenv('MAIL_MIRROR_DIR', 'mail_mirror')  # Vazio: não guarda as mensagens
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    digest TEXT PRIMARY KEY,
+    message_id TEXT,
+    uid INTEGER,
+    uidvalidity INTEGER,
+    size INTEGER NOT NULL,
+    stored_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_message_id ON messages (message_id);
+CREATE INDEX IF NOT EXISTS idx_messages_uid ON messages (uidvalidity, uid);
+"""
+
+_local = threading.local()
+
+def get_connection():
+    """Retorna a conexão SQLite do índice para a thread atual, criando o schema na primeira vez."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(MAIL_MIRROR_DIR, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(MAIL_MIRROR_DIR, 'index.db'), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+def message_path(digest):
+    """Caminho do arquivo compactado de uma mensagem."""
+    return os.path.join(MAIL_MIRROR_DIR, digest[:2], f"{digest}.eml.gz")
+
+def store_message(raw_email, uid=None, uidvalidity=None):
+    """
+    Guarda o e-mail bruto no espelho e retorna o seu SHA-256. O arquivo é endereçado
+    pelo conteúdo: a mesma mensagem baixada de novo não é gravada duas vezes.
+    """
+    digest = hashlib.sha256(raw_email).hexdigest()
+    path = message_path(digest)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(raw_email)
+        os.replace(tmp_path, path)
+
+    headers, _ = parse_headers(raw_email)
+    message_id = (headers.get('Message-ID') or '').strip() or None
+
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO messages (digest, message_id, uid, uidvalidity, size, stored_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, message_id, uid, uidvalidity, len(raw_email), datetime.now().isoformat(timespec='seconds'))
+        )
+    return digest
+
+def load_message(digest):
+    """Lê uma mensagem do espelho pelo SHA-256."""
+    with gzip.open(message_path(digest), 'rb') as f:
+        return f.read()
+
+def find_message(message_id=None, uid=None, uidvalidity=None):
+    """Retorna o SHA-256 da mensagem pelo Message-ID ou pelo par UIDVALIDITY/UID (ou None)."""
+    conn = get_connection()
+    if message_id is not None:
+        row = conn.execute("SELECT digest FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+    else:
+        row = conn.execute(
+            "SELECT digest FROM messages WHERE uidvalidity = ? AND uid = ?", (uidvalidity, uid)
+        ).fetchone()
+    return row["digest"] if row else None
+
+def iter_messages():
+    """Percorre (sha256, e-mail bruto) de todas as mensagens do espelho, na ordem de chegada."""
+    rows = get_connection().execute(
+        "SELECT digest FROM messages ORDER BY uidvalidity, uid, stored_at"
+    ).fetchall()
+
+    for row in rows:
+        try:
+            raw_email = load_message(row["digest"])
+        except (OSError, EOFError) as e:
+            logger.warning("Mensagem %s do espelho ilegível: %s", row["digest"], e)
+            continue
+        yield row["digest"], raw_email
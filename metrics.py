@@ -0,0 +1,158 @@
+import os
+import logging
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+
+import rate_limiter
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Relatório de cada execução (lista JSON, um objeto por execução)
+METRICS_FILE = os.getenv('METRICS_FILE', 'logs.json')
+
+# Quantas execuções são mantidas no METRICS_FILE (as mais antigas são descartadas)
+METRICS_MAX_RUNS = int(os.getenv('METRICS_MAX_RUNS', '500'))
+
+# Opcional: arquivo no formato textfile do node_exporter (Prometheus)
+METRICS_PROMETHEUS_FILE = os.getenv('METRICS_PROMETHEUS_FILE')
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_started_at = datetime.now()
+_started = time.monotonic()
+
+def reset():
+    """Zera tempos e contadores para começar uma nova execução."""
+    global _started_at, _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _started_at = datetime.now()
+        _started = time.monotonic()
+    rate_limiter.reset_stats()
+
+def record(stage, seconds):
+    """Soma uma duração (segundos) à etapa."""
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0}
+        stats["count"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+@contextmanager
+def timer(stage):
+    """Mede o tempo de parede do bloco e soma na etapa (também quando há exceção)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+def increment(name, amount=1):
+    """Incrementa um contador (ex.: chamadas por método do Bitrix)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def build_report(command):
+    """Monta o relatório da execução atual."""
+    with _lock:
+        stages = {
+            name: {
+                "count": stats["count"],
+                "seconds": round(stats["seconds"], 4),
+                "max_seconds": round(stats["max_seconds"], 4),
+            }
+            for name, stats in sorted(_stages.items())
+        }
+        counters = dict(sorted(_counters.items()))
+        started_at = _started_at
+        duration = time.monotonic() - _started
+
+    throttle = rate_limiter.get_stats()
+    return {
+        "command": command,
+        "started_at": started_at.isoformat(timespec='seconds'),
+        "finished_at": datetime.now().isoformat(timespec='seconds'),
+        "duration_seconds": round(duration, 3),
+        "stages": stages,
+        "counters": counters,
+        "bitrix": {
+            "calls": throttle["calls"],
+            "throttled_calls": throttle["throttled_calls"],
+            "throttled_seconds": round(throttle["throttled_seconds"], 3),
+            "retries": throttle["retries"],
+            "backoff_seconds": round(throttle["backoff_seconds"], 3),
+        },
+    }
+
+def append_report(report, path=None):
+    """Acrescenta o relatório ao METRICS_FILE (gravação atômica)."""
+    path = path or METRICS_FILE
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            runs = json.load(f)
+        if not isinstance(runs, list):
+            runs = []
+    except (FileNotFoundError, json.JSONDecodeError):
+        runs = []
+
+    runs.append(report)
+    runs = runs[-METRICS_MAX_RUNS:]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(runs, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+def write_prometheus(report, path=None):
+    """Grava o relatório no formato textfile do Prometheus (gravação atômica)."""
+    path = path or METRICS_PROMETHEUS_FILE
+    if not path:
+        return
+
+    lines = [
+        "# TYPE abertura_run_duration_seconds gauge",
+        f"abertura_run_duration_seconds {report['duration_seconds']}",
+        "# TYPE abertura_run_timestamp_seconds gauge",
+        f"abertura_run_timestamp_seconds {int(time.time())}",
+        "# TYPE abertura_stage_seconds gauge",
+    ]
+    lines += [f'abertura_stage_seconds{{stage="{_label(name)}"}} {stats["seconds"]}' for name, stats in report["stages"].items()]
+    lines.append("# TYPE abertura_stage_count gauge")
+    lines += [f'abertura_stage_count{{stage="{_label(name)}"}} {stats["count"]}' for name, stats in report["stages"].items()]
+    lines.append("# TYPE abertura_counter gauge")
+    lines += [f'abertura_counter{{name="{_label(name)}"}} {value}' for name, value in report["counters"].items()]
+    lines.append("# TYPE abertura_bitrix gauge")
+    lines += [f'abertura_bitrix{{metric="{name}"}} {value}' for name, value in report["bitrix"].items()]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+def finish_run(command):
+    """Grava o relatório da execução (METRICS_FILE e, se configurado, o textfile) e o retorna."""
+    report = build_report(command)
+    try:
+        append_report(report)
+        write_prometheus(report)
+    except OSError as e:
+        logger.warning("⚠️ Não foi possível gravar o relatório da execução: %s", e)
+
+    slowest = sorted(report["stages"].items(), key=lambda item: item[1]["seconds"], reverse=True)[:3]
+    resumo = ", ".join(f"{name} {stats['seconds']:.1f}s" for name, stats in slowest)
+    logger.info("📈 Execução '%s' em %.1fs. Etapas mais lentas: %s", command, report['duration_seconds'], resumo or '-')
+    return report
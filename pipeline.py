@@ -0,0 +1,119 @@
+import os
+import logging
+import time
+import queue
+import threading
+
+import metrics
+import rate_limiter
+from fetch_emails import iter_new_contracts
+from run import notify_pending_records, process_contract
+from verify_data import load_company_index, COMPANY_INDEX_ENABLED
+from contract_store import list_pending
+from log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Modo contínuo: os contratos saem do IMAP direto para os workers do Bitrix e os
+# cards criados seguem para o aviso por e-mail, sem esperar a etapa anterior terminar.
+#
+#   IMAP (iter_new_contracts) -> fila de contratos -> workers -> fila de registros -> aviso
+
+# Quantas threads criam empresas/cards ao mesmo tempo
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '4'))
+
+# Intervalo mínimo (segundos) entre dois e-mails de aviso; os cards criados nesse
+# intervalo vão juntos no próximo envio. O primeiro card é avisado imediatamente.
+NOTIFY_INTERVAL = float(os.getenv('PIPELINE_NOTIFY_INTERVAL', '60'))
+
+# Marca de fim de fila
+_DONE = object()
+
+def produce_contracts(contracts, workers, full_resync=False):
+    """Coloca na fila os contratos pendentes do banco e, em seguida, os novos do IMAP."""
+    try:
+        for contract in list_pending():
+            contracts.put(contract)
+
+        for contract in iter_new_contracts(full_resync):
+            contracts.put(contract)
+    finally:
+        for _ in range(workers):
+            contracts.put(_DONE)
+
+def consume_contracts(contracts, records):
+    """Processa os contratos da fila no Bitrix e repassa os cards criados ao aviso."""
+    while True:
+        contract = contracts.get()
+        if contract is _DONE:
+            break
+
+        hash_name, data = contract
+        registro = process_contract(hash_name, data)
+        if registro is not None:
+            records.put(registro)
+
+def notify_records(records, interval=NOTIFY_INTERVAL):
+    """Envia os avisos dos cards criados, agrupando os que chegam dentro do intervalo."""
+    last_sent = None
+    waiting = 0
+    created = 0
+
+    while True:
+        timeout = None
+        if waiting and last_sent is not None:
+            timeout = max(0.0, interval - (time.monotonic() - last_sent))
+
+        try:
+            registro = records.get(timeout=timeout)
+        except queue.Empty:
+            registro = None
+
+        if registro is _DONE:
+            break
+
+        if registro is not None:
+            waiting += 1
+            created += 1
+
+        if waiting and (last_sent is None or time.monotonic() - last_sent >= interval):
+            notify_pending_records()
+            last_sent = time.monotonic()
+            waiting = 0
+
+    if waiting:
+        notify_pending_records()
+
+    logger.info("📊 Total de novos registros criados: %s", created)
+
+def run_pipeline(workers=None, full_resync=False):
+    """Executa o fluxo contínuo IMAP -> Bitrix -> aviso até a caixa de entrada ser lida inteira."""
+    workers = PIPELINE_WORKERS if workers is None else workers
+    contracts = queue.Queue()
+    records = queue.Queue()
+
+    if COMPANY_INDEX_ENABLED:
+        load_company_index()
+
+    notifier = threading.Thread(target=notify_records, args=(records,), name="notifier")
+    consumers = [
+        threading.Thread(target=consume_contracts, args=(contracts, records), name=f"worker-{i}")
+        for i in range(workers)
+    ]
+    notifier.start()
+    for consumer in consumers:
+        consumer.start()
+
+    try:
+        produce_contracts(contracts, workers, full_resync)
+    finally:
+        for consumer in consumers:
+            consumer.join()
+        records.put(_DONE)
+        notifier.join()
+
+if __name__ == "__main__":
+    setup_logging()
+    run_pipeline()
+    rate_limiter.report()
+    metrics.finish_run("pipeline")
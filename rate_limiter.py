@@ -0,0 +1,91 @@
+import os
+import logging
+import random
+import threading
+import time
+from dotenv import load_dotenv
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Modelo do limite do Bitrix24 (leaky bucket): cada chamada enche o balde em 1 e o
+# balde esvazia RATE chamadas por segundo; com o balde cheio (BURST) o portal
+# responde 503 QUERY_LIMIT_EXCEEDED. O limitador segura as chamadas antes disso.
+RATE = float(os.getenv('BITRIX_RATE', '2'))
+BURST = float(os.getenv('BITRIX_BURST', '50'))
+
+# Backoff exponencial com jitter para as respostas 503
+MAX_RETRIES = int(os.getenv('BITRIX_MAX_RETRIES', '5'))
+BACKOFF_BASE = float(os.getenv('BITRIX_BACKOFF_BASE', '1'))
+BACKOFF_MAX = float(os.getenv('BITRIX_BACKOFF_MAX', '30'))
+
+_lock = threading.Lock()
+_level = 0.0
+_last = time.monotonic()
+_stats = {"calls": 0, "throttled_calls": 0, "throttled_seconds": 0.0, "retries": 0, "backoff_seconds": 0.0}
+
+def reserve():
+    """
+    Reserva uma vaga no balde e retorna quantos segundos a chamada deve esperar
+    antes de ser enviada (0 se pode sair imediatamente). Não dorme, para poder ser
+    usada tanto com time.sleep quanto com asyncio.sleep.
+    """
+    global _level, _last
+    with _lock:
+        now = time.monotonic()
+        _level = max(0.0, _level - (now - _last) * RATE)
+        _last = now
+
+        wait = max(0.0, (_level + 1 - BURST) / RATE)
+        _level += 1
+
+        _stats["calls"] += 1
+        if wait > 0:
+            _stats["throttled_calls"] += 1
+            _stats["throttled_seconds"] += wait
+        return wait
+
+def acquire():
+    """Espera (bloqueando a thread) até a chamada poder ser enviada."""
+    wait = reserve()
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+def limit_exceeded(attempt):
+    """
+    Registra um 503 do Bitrix: considera o balde cheio (o portal discorda do nosso
+    cálculo, então ajusta-se a ele) e retorna o tempo de backoff da tentativa.
+    """
+    global _level, _last
+    with _lock:
+        now = time.monotonic()
+        _level = max(_level, BURST)
+        _last = now
+
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+        _stats["retries"] += 1
+        _stats["backoff_seconds"] += delay
+        return delay
+
+def reset_stats():
+    """Zera os contadores do limitador (o estado do balde é mantido)."""
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0.0 if key.endswith("seconds") else 0
+
+def get_stats():
+    """Retorna uma cópia dos contadores do limitador."""
+    with _lock:
+        return dict(_stats)
+
+def report():
+    """Registra quanto tempo a execução passou aguardando o limite do Bitrix."""
+    stats = get_stats()
+    logger.info(
+        "⏱️ Bitrix: %s chamadas, %s seguradas pelo limitador (%.1fs), %s retentativas por 503 (%.1fs de backoff).",
+        stats['calls'], stats['throttled_calls'], stats['throttled_seconds'],
+        stats['retries'], stats['backoff_seconds']
+    )
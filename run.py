@@ -1,48 +1,192 @@
 import os
-import json
+import logging
+import sys
+import argparse
 import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import json as json_lib  # para evitar conflito com o json da stdlib
 
-from create_sittax import create_comp_and_card_sittax
-from create_acessorias import create_comp_and_card_acessorias
-from fetch_emails import process_emails
+import metrics
+import rate_limiter
+from contract_flow import create_comp_and_card, update_company_system, FLOWS
+from verify_data import (
+    check_company_in_bitrix,
+    load_company_index,
+    normalize_cnpj,
+    prefetch_cards,
+    prefetch_companies,
+    COMPANY_INDEX_ENABLED
+)
+from fetch_emails import backfill_emails, process_emails, reparse_mirror
+from mail_import import check_export, import_export
+from log_config import contract_context, setup_logging
+from contract_store import (
+    get_contract,
+    list_pending,
+    list_unnotified,
+    mark_failed,
+    mark_group_notified,
+    set_state,
+    STATUS_NOTIFIED
+)
 
-process_emails()
+logger = logging.getLogger(__name__)
 
-def process_json_files(cache_dir='cache/'):
+# Quantos contratos são enviados ao Bitrix em paralelo (1 = sequencial). Todas as
+# threads dividem o mesmo rate_limiter e o mesmo pool de conexões (BITRIX_POOL_SIZE).
+RUN_WORKERS = int(os.getenv('RUN_WORKERS', '1'))
+
+# Um lock por CNPJ: contratos da mesma empresa nunca são processados ao mesmo tempo,
+# evitando que duas threads criem a mesma empresa ou o mesmo card
+_cnpj_locks = {}
+_cnpj_locks_lock = threading.Lock()
+
+def get_cnpj_lock(cnpj):
+    """Retorna o lock do CNPJ, criando-o na primeira vez."""
+    key = normalize_cnpj(cnpj) or cnpj
+    with _cnpj_locks_lock:
+        lock = _cnpj_locks.get(key)
+        if lock is None:
+            lock = _cnpj_locks[key] = threading.Lock()
+        return lock
+
+def prefetch_bitrix_lookups(pendentes):
     """
-    Processa os arquivos JSON no diretório de cache e acumula
-    apenas os registros de cards efetivamente criados no Bitrix.
+    Resolve em lote (método batch do Bitrix) as empresas por CNPJ e os cards por
+    empresa de todos os contratos pendentes, para que os fluxos de criação consultem
+    o cache em vez de fazer uma chamada por contrato.
     """
-    novos_registros = []
+    if not pendentes:
+        return
+
+    # Com o índice de empresas carregado as consultas por CNPJ são locais
+    if not (COMPANY_INDEX_ENABLED and load_company_index()):
+        prefetch_companies(data.get('cnpj') for _, data in pendentes)
+
+    company_ids = {flow: set() for flow in FLOWS.values()}
+    for hash_name, data in pendentes:
+        flow = FLOWS.get(data.get('modeloDeContrato', '').strip())
+        if flow is None:
+            continue
+
+        # Contratos retomados já têm a empresa salva; os demais usam a empresa encontrada pelo CNPJ
+        company_id = get_contract(hash_name)["company_id"]
+        if not company_id:
+            company = check_company_in_bitrix(data.get('cnpj'))
+            if company and company.get("result"):
+                company_id = company["result"][0]["ID"]
+        if company_id:
+            company_ids[flow].add(company_id)
+
+    for flow, ids in company_ids.items():
+        prefetch_cards(ids, flow.CARD_ENTITY_TYPE_ID, flow.CARD_FILTER)
+
+def process_contract(hash_name, data, update_system=True):
+    """
+    Processa um contrato pendente e retorna o registro do card criado (ou None). Com
+    update_system o sistema da empresa é atualizado logo após a criação do card, ainda
+    com o lock do CNPJ (process_company desliga para fazer uma única atualização por
+    empresa).
+    """
+    modelo = data.get('modeloDeContrato', '').strip()
+    flow = FLOWS.get(modelo)
+    registro = None
+
+    with contract_context(hash_name), get_cnpj_lock(data.get('cnpj')), metrics.timer("sync.contract"):
+        logger.debug("📂 Processando contrato: %s | Modelo: %s", hash_name, modelo)
+        try:
+            if flow is not None:
+                registro = create_comp_and_card(flow, hash_name)
+            else:
+                mark_failed(hash_name, f"Modelo de contrato sem integração: {modelo}")
+        except Exception as e:
+            logger.error("❌ Erro ao processar o contrato %s: %s", hash_name, e)
+            mark_failed(hash_name, e)
+
+        if registro is not None and update_system:
+            sync_company_system(data.get('cnpj'), [registro["modeloDeContrato"]])
+
+    logger.debug("🔍 Registro retornado para %s: %s", hash_name, registro)
+    if registro is not None:
+        metrics.increment("contracts.cards_created")
+    return registro
+
+def plan_by_company(pendentes):
+    """
+    Agrupa os contratos pendentes por CNPJ normalizado (renovações, Sittax + Acessórias
+    do mesmo cliente), na ordem em que cada empresa aparece pela primeira vez.
+    """
+    groups = {}
+    for hash_name, data in pendentes:
+        key = normalize_cnpj(data.get('cnpj')) or hash_name
+        groups.setdefault(key, []).append((hash_name, data))
+    return list(groups.values())
+
+def sync_company_system(cnpj, modelos):
+    """
+    Atualiza o sistema da empresa para cobrir os produtos dos cards criados (ver
+    contract_flow.company_system_steps). Chamado com o lock do CNPJ; um erro aqui não
+    desfaz os cards, apenas é registrado.
+    """
+    try:
+        update_company_system(cnpj, modelos)
+    except Exception as e:
+        logger.error("❌ Erro ao atualizar o sistema da empresa com CNPJ %s: %s", cnpj, e)
+
+def process_company(contratos):
+    """
+    Processa em sequência os contratos de uma mesma empresa. A empresa é resolvida (ou
+    criada) pelo primeiro contrato e reaproveitada pelos demais pelo cache, sem nova
+    consulta ou criação; o sistema da empresa é atualizado uma vez, no fim, com os
+    produtos de todos os cards criados. Retorna os registros na ordem dos contratos.
+    """
+    registros = [process_contract(hash_name, data, update_system=False) for hash_name, data in contratos]
 
-    for filename in os.listdir(cache_dir):
-        if filename.endswith('.json'):
-            filepath = os.path.join(cache_dir, filename)
-            with open(filepath, 'r', encoding='utf-8') as file:
-                data = json.load(file)
+    criados = [registro for registro in registros if registro is not None]
+    if criados:
+        cnpj = contratos[0][1].get('cnpj')
+        with get_cnpj_lock(cnpj):
+            sync_company_system(cnpj, [registro["modeloDeContrato"] for registro in criados])
 
-            modelo = data.get('modeloDeContrato', '').strip()
-            hash_name = filename[:-5]
-            registro = None
+    return registros
 
-            print(f"📂 Processando arquivo: {filename} | Modelo: {modelo}")
+def process_json_files(workers=None):
+    """
+    Processa os contratos pendentes do banco de contratos e acumula
+    apenas os registros de cards efetivamente criados no Bitrix.
 
-            if modelo in ["Acessórias", "Acessórias + Komunic"]:
-                registro = create_comp_and_card_acessorias(hash_name)
-            elif modelo in ["Openix - Sittax SN", "Sittax - Simples Nacional"]:
-                registro = create_comp_and_card_sittax(hash_name)
+    Contratos concluídos em execuções anteriores não são listados; os que falharam
+    ou pararam no meio são retomados pela etapa salva no banco.
+
+    Os contratos são agrupados por empresa (plan_by_company) e cada grupo é processado
+    por process_company. Com workers > 1 (padrão RUN_WORKERS) os grupos são distribuídos
+    entre threads; os registros voltam na ordem dos grupos.
+    """
+    workers = RUN_WORKERS if workers is None else workers
+    novos_registros = []
+    with metrics.timer("sync.list_pending"):
+        pendentes = list_pending()
+    with metrics.timer("sync.prefetch"):
+        prefetch_bitrix_lookups(pendentes)
+    grupos = plan_by_company(pendentes)
 
-            print(f"🔍 Registro retornado para {hash_name}: {registro}")
+    if workers > 1 and len(grupos) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_company, contratos) for contratos in grupos]
+            registros = [registro for future in futures for registro in future.result()]
+    else:
+        registros = [registro for contratos in grupos for registro in process_company(contratos)]
 
-            # Só adiciona aos novos registros se um registro válido for retornado
-            if registro is not None:
-                novos_registros.append(registro)
-                print(f"✅ Novo registro adicionado: {registro}")
+    for registro in registros:
+        # Só adiciona aos novos registros se um registro válido for retornado
+        if registro is not None:
+            novos_registros.append(registro)
+            logger.debug("✅ Novo registro adicionado: %s", registro)
 
-    print(f"📊 Total de novos registros criados: {len(novos_registros)}")
+    logger.info("📊 Total de novos registros criados: %s", len(novos_registros))
     return novos_registros
 
 
@@ -52,10 +196,15 @@ def send_new_records_email(novos_registros):
     - EMAIL_RECEIVER_SITTAX -> Recebe apenas contratos Sittax.
     - EMAIL_RECEIVER_ACESSORIAS -> Recebe apenas contratos Acessórias.
     - EMAIL_RECEIVER_GENERAL -> Recebe todos os contratos.
+
+    Cada grupo recebe só os registros que ainda não recebeu (ver "notified_groups" de
+    list_unnotified), e os envios bem-sucedidos ficam gravados por grupo: se um envio
+    falhar, só o grupo que falhou recebe os registros de novo na próxima execução.
+    Retorna True se todos os grupos foram avisados.
     """
     if not novos_registros:
-        print("Nenhum registro novo encontrado. Email não será enviado.")
-        return
+        logger.debug("Nenhum registro novo encontrado. Email não será enviado.")
+        return True
 
     EMAIL = os.getenv('EMAIL')
     PASSWORD = os.getenv('PASSWORD')
@@ -84,7 +233,7 @@ def send_new_records_email(novos_registros):
     # Função para montar e enviar o email
     def enviar_email(destinatarios, registros, tipo_email):
         if not registros or not destinatarios:
-            return  # Se não há registros ou destinatários, não envia email
+            return True  # Se não há registros ou destinatários, não envia email
 
         subject = f"Nova Abertura de Base no Bitrix - {tipo_email}"
 
@@ -170,20 +319,105 @@ def send_new_records_email(novos_registros):
         msg.attach(MIMEText(body, 'html'))
 
         try:
-            server = smtplib.SMTP(SMTP_SERVER, 587)
-            server.starttls()
-            server.login(EMAIL, PASSWORD)
-            server.sendmail(EMAIL, destinatarios, msg.as_string())
-            server.quit()
-            print(f"📧 Email enviado com sucesso para {tipo_email}: {destinatarios}")
+            with metrics.timer("smtp"):
+                server = smtplib.SMTP(SMTP_SERVER, 587)
+                server.starttls()
+                server.login(EMAIL, PASSWORD)
+                server.sendmail(EMAIL, destinatarios, msg.as_string())
+                server.quit()
+            logger.info("📧 Email enviado com sucesso para %s: %s", tipo_email, destinatarios)
+            return True
         except Exception as e:
-            print(f"❌ Erro ao enviar email para {tipo_email}: {e}")
+            logger.error("❌ Erro ao enviar email para %s: %s", tipo_email, e)
+            return False
 
     # Enviar emails para os grupos correspondentes
-    enviar_email(EMAIL_RECEIVER_SITTAX, registros_sittax, "Sittax")
-    enviar_email(EMAIL_RECEIVER_ACESSORIAS, registros_acessorias, "Acessórias")
-    enviar_email(EMAIL_RECEIVER_GENERAL, novos_registros, "Geral")  # Envia todos
+    grupos = [
+        (EMAIL_RECEIVER_SITTAX, registros_sittax, "Sittax"),
+        (EMAIL_RECEIVER_ACESSORIAS, registros_acessorias, "Acessórias"),
+        (EMAIL_RECEIVER_GENERAL, novos_registros, "Geral")  # Envia todos
+    ]
+    enviados = []
+    for destinatarios, registros, tipo_email in grupos:
+        pendentes = [registro for registro in registros if tipo_email not in registro.get("notified_groups", ())]
+        enviado = enviar_email(destinatarios, pendentes, tipo_email)
+        if enviado and pendentes and destinatarios:
+            mark_group_notified([registro["hash"] for registro in pendentes if "hash" in registro], tipo_email)
+        enviados.append(enviado)
+    return all(enviados)
+
+
+def notify_pending_records():
+    """
+    Envia o aviso dos cards criados que ainda não foram notificados (inclusive os de
+    execuções anteriores que pararam antes do envio) e marca-os como notificados
+    quando todos os grupos de destinatários forem avisados.
+    """
+    registros = list_unnotified()
+    if send_new_records_email(registros):
+        for registro in registros:
+            set_state(registro["hash"], STATUS_NOTIFIED)
+    else:
+        logger.warning("⚠️ Falha no envio. Os grupos que falharam serão avisados na próxima execução.")
+
+def main(argv=None):
+    """
+    Ponto de entrada da linha de comando. Cada etapa roda uma única vez:
+
+        python run.py fetch    # lê os e-mails novos e salva os contratos
+        python run.py sync     # cria empresas e cards dos contratos pendentes
+        python run.py notify   # envia o aviso dos cards ainda não notificados
+        python run.py all      # as três etapas em sequência (padrão)
+        python run.py reparse  # refaz os contratos a partir do espelho local dos e-mails
+        python run.py import caixa.mbox  # importa exportações mbox / Maildir / .eml, sem IMAP
+    """
+    parser = argparse.ArgumentParser(description="Abertura de base no Bitrix a partir dos e-mails de contrato.")
+    parser.add_argument("command", nargs="?", default="all", choices=["fetch", "sync", "notify", "all", "reparse", "import"])
+    parser.add_argument("paths", nargs="*", help="arquivos mbox / .eml ou pastas Maildir / de .eml (import)")
+    parser.add_argument("--full-resync", action="store_true", help="relê a caixa de entrada inteira (fetch/all)")
+    parser.add_argument("--workers", type=int, default=None, help="contratos processados em paralelo (sync/all) ou processos de extração (import)")
+    parser.add_argument("--backfill", action="store_true", help="baixa a caixa em várias conexões IMAP em paralelo, para cargas grandes (fetch/all)")
+    parser.add_argument("--rebuild-index", action="store_true", help="refaz o índice de empresas inteiro antes de sincronizar (sync/all)")
+    parser.add_argument("--connections", type=int, default=None, help="conexões IMAP do --backfill (padrão IMAP_BACKFILL_CONNECTIONS)")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        if not args.paths:
+            parser.error("informe os arquivos ou pastas a importar")
+        for path in args.paths:
+            problem = check_export(path)
+            if problem:
+                parser.error(f"{path}: {problem}")
+    elif args.paths:
+        parser.error(f"argumentos não reconhecidos: {' '.join(args.paths)} (arquivos só são aceitos pelo comando import)")
+
+    setup_logging()
+    metrics.reset()
+
+    if args.command == "reparse":
+        reparse_mirror()
+
+    if args.command == "import":
+        import_export(args.paths, workers=args.workers)
+
+    if args.command in ("fetch", "all"):
+        if args.backfill:
+            backfill_emails(connections=args.connections, full_resync=args.full_resync)
+        else:
+            process_emails(full_resync=args.full_resync)
+
+    if args.command in ("sync", "all"):
+        if args.rebuild_index and COMPANY_INDEX_ENABLED:
+            load_company_index(full=True)
+        process_json_files(workers=args.workers)
+
+    if args.command in ("notify", "all"):
+        notify_pending_records()
+
+    if args.command in ("sync", "all"):
+        rate_limiter.report()
+
+    metrics.finish_run(args.command)
 
 if __name__ == "__main__":
-    novos_registros = process_json_files()
-    send_new_records_email(novos_registros)
+    main(sys.argv[1:])
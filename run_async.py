@@ -0,0 +1,80 @@
+import os
+import logging
+import asyncio
+
+import bitrix_async
+import metrics
+import rate_limiter
+from contract_flow import create_comp_and_card_async, update_company_system_async, FLOWS
+from verify_data import normalize_cnpj
+from fetch_emails import process_emails
+from log_config import contract_context, setup_logging
+from run import notify_pending_records, prefetch_bitrix_lookups
+from contract_store import list_pending, mark_failed
+
+logger = logging.getLogger(__name__)
+
+# Quantos contratos ficam em andamento ao mesmo tempo no event loop
+ASYNC_CONCURRENCY = int(os.getenv('ASYNC_CONCURRENCY', '10'))
+
+async def process_contract(hash_name, data, semaphore, cnpj_locks):
+    """
+    Processa um contrato respeitando o lock do CNPJ e o limite de concorrência. O lock
+    é obtido antes da vaga no semáforo, para que contratos esperando outro da mesma
+    empresa não ocupem vagas. Como em run.process_contract, o sistema da empresa é
+    atualizado logo após a criação do card, ainda com o lock do CNPJ.
+    """
+    modelo = data.get('modeloDeContrato', '').strip()
+    flow = FLOWS.get(modelo)
+    if flow is None:
+        mark_failed(hash_name, f"Modelo de contrato sem integração: {modelo}")
+        return None
+
+    cnpj_lock = cnpj_locks.setdefault(normalize_cnpj(data.get('cnpj')), asyncio.Lock())
+    with contract_context(hash_name):
+        async with cnpj_lock, semaphore:
+            logger.debug("📂 Processando contrato: %s | Modelo: %s", hash_name, modelo)
+            try:
+                registro = await create_comp_and_card_async(flow, hash_name)
+            except Exception as e:
+                logger.error("❌ Erro ao processar o contrato %s: %s", hash_name, e)
+                mark_failed(hash_name, e)
+                return None
+
+            if registro is not None:
+                try:
+                    await update_company_system_async(data.get('cnpj'), [registro["modeloDeContrato"]])
+                except Exception as e:
+                    logger.error("❌ Erro ao atualizar o sistema da empresa com CNPJ %s: %s", data.get('cnpj'), e)
+            return registro
+
+async def process_contracts_async(concurrency=None):
+    """
+    Processa todos os contratos pendentes em um único event loop, com no máximo
+    `concurrency` (padrão ASYNC_CONCURRENCY) contratos em andamento. Os registros
+    voltam na ordem dos contratos pendentes.
+    """
+    concurrency = ASYNC_CONCURRENCY if concurrency is None else concurrency
+    pendentes = list_pending()
+    prefetch_bitrix_lookups(pendentes)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    cnpj_locks = {}
+    try:
+        registros = await asyncio.gather(
+            *(process_contract(hash_name, data, semaphore, cnpj_locks) for hash_name, data in pendentes)
+        )
+    finally:
+        await bitrix_async.close()
+
+    novos_registros = [registro for registro in registros if registro is not None]
+    logger.info("📊 Total de novos registros criados: %s", len(novos_registros))
+    return novos_registros
+
+if __name__ == "__main__":
+    setup_logging()
+    process_emails()
+    asyncio.run(process_contracts_async())
+    notify_pending_records()
+    rate_limiter.report()
+    metrics.finish_run("async")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Os módulos do projeto ficam na raiz e os geradores de e-mails de exemplo em benchmarks/
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
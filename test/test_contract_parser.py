@@ -0,0 +1,80 @@
+import glob
+import json
+import os
+
+import pytest
+
+from contract_parser import build_contract_info, format_phone, parse_contract
+from samples import ROOT_DIR, render_contract_body
+
+CACHED_CONTRACTS = sorted(glob.glob(os.path.join(ROOT_DIR, "cache", "*.json")))
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def normalize(value):
+    return ' '.join(value.split()) if value else None
+
+def expected_info(data):
+    """O que build_contract_info deve devolver para o corpo montado por render_contract_body."""
+    emails = [e.strip() for e in data.get("emails") or [] if e] + ["contato@exemplo.com.br"] * 3
+    phones = list(data.get("phones") or []) + ["+5541999999999"] * 2
+    return {
+        "razaoSocial": normalize(data["razaoSocial"]),
+        "cnpj": data["cnpj"],
+        "modeloDeContrato": normalize(data["modeloDeContrato"]),
+        "consultor": normalize(data["consultor"]),
+        "emails": emails[:3],
+        "phones": [phone for phone in map(format_phone, phones[:2]) if phone],
+        "valorMensalidade": normalize(data.get("valorMensalidade")),
+        "valorLicenca": normalize(data.get("valorLicenca")),
+        "qtdCnpj": normalize(data.get("qtdCnpj")),
+        "diretor": normalize(data.get("diretor")),
+    }
+
+def as_paragraphs(body):
+    """O mesmo e-mail com os títulos de seção em parágrafos e sem <br /> antes dos blocos."""
+    return (body
+            .replace("<br />\n<b>Diretor</b><br />\n", "<p><b>Diretor</b></p><p>")
+            .replace("<br />\n<b>Financeiro</b><br />\n", "</p><p><b>Financeiro</b></p><p>"))
+
+@pytest.mark.parametrize("path", CACHED_CONTRACTS, ids=os.path.basename)
+def test_build_contract_info_from_cached_contracts(path):
+    data = load(path)
+    contrato, info = build_contract_info(render_contract_body(data, "000123"))
+    assert contrato == "000123"
+    assert info == expected_info(data)
+
+@pytest.mark.parametrize("path", CACHED_CONTRACTS[:10], ids=os.path.basename)
+def test_build_contract_info_with_paragraph_sections(path):
+    data = load(path)
+    contrato, info = build_contract_info(as_paragraphs(render_contract_body(data, "000123")))
+    assert contrato == "000123"
+    assert info == expected_info(data)
+
+def test_heading_and_label_separated_only_by_tags():
+    body = (
+        "<b>Razão Social:</b> ACME LTDA<br />"
+        "<p><b>Diretor</b></p><p>Nome: Fulano<br />Telefone: (41) 99999-9999<br />"
+        "<p><b>Financeiro</b></p><p>Nome: Beltrano<br />E-mail: fin@acme.com<br />"
+    )
+    sections = parse_contract(body)
+    assert sections["empresa"] == {"Razão Social": "ACME LTDA"}
+    assert sections["diretor"] == {"Nome": "Fulano", "Telefone": "(41) 99999-9999"}
+    assert sections["financeiro"] == {"Nome": "Beltrano", "E-mail": "fin@acme.com"}
+
+def test_label_closed_by_tag_before_colon():
+    sections = parse_contract("<b>CNPJ</b>: 22.090.089/0001-67<br /><b>Consultor:</b>&nbsp;Maria<br />")
+    assert sections["empresa"] == {"CNPJ": "22.090.089/0001-67", "Consultor": "Maria"}
+
+def test_person_blocks_without_headings():
+    body = "Contrato: 1<br />Nome: Diretor<br />E-mail: d@x.com<br />Nome: Financeiro<br />E-mail: f@x.com<br />"
+    sections = parse_contract(body)
+    assert sections["diretor"] == {"Nome": "Diretor", "E-mail": "d@x.com"}
+    assert sections["financeiro"] == {"Nome": "Financeiro", "E-mail": "f@x.com"}
+
+def test_missing_required_field_returns_no_info():
+    contrato, info = build_contract_info("<b>Contrato:</b> 42<br /><b>CNPJ:</b> 1<br />")
+    assert contrato == "42"
+    assert info is None
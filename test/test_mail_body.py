@@ -0,0 +1,115 @@
+import base64
+import email
+import quopri
+from email import policy
+
+import pytest
+
+from mail_body import extract_body
+
+def stdlib_body(raw):
+    """Corpo esperado segundo o parser da biblioteca padrão (text/plain, senão text/html)."""
+    msg = email.message_from_bytes(raw, policy=policy.compat32)
+    html = None
+    for part in msg.walk():
+        if part.is_multipart() or 'attachment' in str(part.get('Content-Disposition', '')):
+            continue
+        if part.get_content_type() == 'text/plain':
+            chosen = part
+            break
+        if part.get_content_type() == 'text/html' and html is None:
+            html = part
+    else:
+        chosen = html
+    if chosen is None:
+        return ""
+
+    payload = chosen.get_payload(decode=True)
+    try:
+        return payload.decode(chosen.get_content_charset() or 'utf-8', errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+def part(content_type, body, encoding='8bit', charset='utf-8', extra=b''):
+    data = body.encode(charset) if isinstance(body, str) else body
+    if encoding == 'base64':
+        data = base64.encodebytes(data)
+    elif encoding == 'quoted-printable':
+        data = quopri.encodestring(data)
+    return (f'Content-Type: {content_type}; charset="{charset}"\r\n'
+            f'Content-Transfer-Encoding: {encoding}\r\n').encode() + extra + b'\r\n' + data
+
+def multipart(subtype, boundary, parts, headers=b'', closed=True, preamble=b'Preambulo ignorado\r\n', padding=b''):
+    out = headers + f'Content-Type: multipart/{subtype}; boundary="{boundary}"\r\n\r\n'.encode()
+    out += preamble
+    for p in parts:
+        out += f'--{boundary}'.encode() + padding + b'\r\n' + p + b'\r\n'
+    if closed:
+        out += f'--{boundary}--\r\n'.encode()
+    return out
+
+HEADERS = b'From: contratos@exemplo.com.br\r\nSubject: Novo contrato\r\nMIME-Version: 1.0\r\n'
+TEXT = 'Razão Social: Empresa Ação Ltda\nCNPJ: 12.345.678/0001-90\n'
+HTML = '<p><b>Razão Social:</b> Empresa Ação Ltda</p><p><b>CNPJ:</b> 12.345.678/0001-90</p>'
+ATTACHMENT = (b'Content-Type: application/pdf; name="contrato.pdf"\r\n'
+              b'Content-Disposition: attachment; filename="contrato.pdf"\r\n'
+              b'Content-Transfer-Encoding: base64\r\n\r\n' + base64.encodebytes(b'%PDF-1.4' * 100))
+
+CASES = {
+    "nested_alternative_in_mixed": multipart('mixed', 'externo', [
+        multipart('alternative', 'interno', [
+            part('text/plain', TEXT, 'quoted-printable'),
+            part('text/html', HTML, 'base64'),
+        ]),
+        ATTACHMENT,
+    ], HEADERS),
+    "nested_html_only_in_mixed": multipart('mixed', 'externo', [
+        ATTACHMENT,
+        multipart('alternative', 'interno', [part('text/html', HTML, 'quoted-printable')]),
+    ], HEADERS),
+    "base64_plain": multipart('alternative', 'b64', [
+        part('text/plain', TEXT, 'base64'),
+        part('text/html', HTML, 'base64'),
+    ], HEADERS),
+    "quoted_printable_latin1": multipart('alternative', 'qp', [
+        part('text/plain', TEXT * 20, 'quoted-printable', charset='iso-8859-1'),
+    ], HEADERS),
+    "unknown_charset": multipart('mixed', 'x', [
+        part('text/plain', TEXT.encode('utf-8'), 'quoted-printable', charset='x-charset-inexistente'),
+    ], HEADERS),
+    "missing_closing_boundary": multipart('mixed', 'aberto', [
+        part('text/html', HTML, '8bit'),
+        part('text/plain', TEXT, 'base64'),
+    ], HEADERS, closed=False),
+    "html_only": HEADERS + part('text/html', HTML, 'quoted-printable'),
+    "plain_single_part": HEADERS + part('text/plain', TEXT, '8bit'),
+    "lf_line_endings": multipart('alternative', 'lf', [
+        part('text/plain', TEXT, 'quoted-printable'),
+        part('text/html', HTML, '8bit'),
+    ], HEADERS).replace(b'\r\n', b'\n'),
+    "no_preamble_with_padding": multipart('alternative', 'pad', [
+        part('text/html', HTML, '8bit'),
+        part('text/plain', TEXT, 'quoted-printable'),
+    ], HEADERS, preamble=b'', padding=b'  \t'),
+    "attachment_only": multipart('mixed', 'anexo', [ATTACHMENT], HEADERS),
+}
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_extract_body_matches_stdlib(name):
+    raw = CASES[name]
+    headers, body = extract_body(raw)
+    assert body == stdlib_body(raw)
+    assert body or name == "attachment_only"
+    assert headers['Subject'] == 'Novo contrato'
+
+def test_extract_body_prefers_plain_over_earlier_html():
+    _, body = extract_body(CASES["missing_closing_boundary"])
+    assert body == TEXT
+
+def test_extract_body_falls_back_to_html():
+    _, body = extract_body(CASES["nested_html_only_in_mixed"])
+    assert body == HTML
+
+def test_extract_body_unknown_charset_decodes_as_utf8():
+    _, body = extract_body(CASES["unknown_charset"])
+    assert body == TEXT
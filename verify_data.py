@@ -1,17 +1,22 @@
 import os
+import logging
+import re
 import json
-import requests
+import threading
 import time
+import requests
+import bitrix_client
+import metrics
+from datetime import datetime, timezone
+from urllib.parse import quote
 from dotenv import load_dotenv
 
+from contract_store import DB_PATH, load_contract
+
 # Carregar variáveis do arquivo .env
 load_dotenv()
 
-# Caminho para a pasta de cache
-CACHE_DIR = 'cache'
-
-# Configurações da API do Bitrix
-BITRIX_WEBHOOK_URL = os.getenv('BITRIX_WEBHOOK_URL')
+logger = logging.getLogger(__name__)
 
 # Mapeamento de IDs para sistemas
 SYSTEM_MAPPING = {
@@ -32,39 +37,366 @@ MODELO_CONTRATO_CONFIG = {
     "Acessórias + Komunic": {"entityTypeId": 187, "system_id": "235"}
 }
 
+# Produtos cobertos por cada sistema, para combinar o sistema da empresa quando ela
+# passa a ter contratos de mais de um produto (ex.: Sittax + Acessórias -> 655)
+SYSTEM_PRODUCTS = {
+    "233": {"233"},
+    "235": {"235"},
+    "237": {"237"},
+    "655": {"237", "233"},
+    "699": {"237", "235"},
+}
+
+# Máximo de comandos aceitos pelo método batch do Bitrix em uma requisição
+BATCH_LIMIT = 50
+
+# Campos lidos de cada empresa nas consultas por CNPJ
+COMPANY_SELECT = ["ID", "UF_CRM_1701275490640", "UF_CRM_1708446996746"]
+
+# Resultados de consultas já feitas nesta execução (preenchidos em lote pelo prefetch)
+#   _company_cache: CNPJ -> dados da empresa (ou None se não existe no Bitrix)
+#   _card_cache: (entityTypeId, ID da empresa) -> lista de IDs de cards
+_company_cache = {}
+_card_cache = {}
+
+# Índice local de todas as empresas do Bitrix (CNPJ normalizado -> empresa), montado
+# por load_company_index com uma varredura paginada de crm.company.list. Enquanto o
+# índice está carregado ele é a fonte das consultas por CNPJ.
+COMPANY_INDEX_ENABLED = os.getenv('COMPANY_INDEX_ENABLED', '1') == '1'
+COMPANY_INDEX_FILE = os.getenv('COMPANY_INDEX_FILE', 'company_index.json')  # Vazio: não persiste
+COMPANY_INDEX_SELECT = COMPANY_SELECT + ["DATE_MODIFY"]
+PAGE_SIZE = 50
+_company_index = None
+_companies_by_id = {}
+_index_date_modify = None
+_index_built_at = None
+# Protege o índice e o arquivo salvo quando várias threads registram empresas
+_index_lock = threading.RLock()
+
+# Idade máxima (segundos) do índice salvo. A atualização por DATE_MODIFY não enxerga
+# empresas apagadas ou mescladas no Bitrix, então depois desse tempo o índice é
+# refeito por inteiro (0: sem limite)
+COMPANY_INDEX_MAX_AGE = float(os.getenv('COMPANY_INDEX_MAX_AGE', '86400'))
+
+class CompanyNotFoundError(RuntimeError):
+    """O Bitrix recusou a chamada porque a empresa não existe mais (apagada ou mesclada)."""
+
+def reset_caches():
+    """
+    Descarta as consultas de empresas e cards guardadas na execução. Processos longos
+    (daemon) chamam a cada rodada, para não reaproveitar cards movidos ou apagados e
+    empresas criadas depois de uma consulta sem resultado.
+    """
+    _company_cache.clear()
+    _card_cache.clear()
+
 def load_cache(hash):
-    """Carrega o cache específico com base no hash fornecido."""
-    cache_path = os.path.join(CACHE_DIR, f"{hash}.json")
+    """Carrega o contrato específico com base no hash fornecido."""
+    data = load_contract(hash)
 
-    if not os.path.exists(cache_path):
-        print(f"Cache {hash}.json não encontrado.")
+    if data is None:
+        logger.debug("Contrato %s não encontrado.", hash)
         return None, None
 
-    with open(cache_path, 'r') as f:
-        data = json.load(f)
+    logger.debug("Contrato %s carregado.", hash)
+    return data, DB_PATH
+
+def bitrix_api_call(method, params):
+    """
+    Faz uma chamada à API do Bitrix e retorna o resultado.
+
+    O controle de limite e as retentativas em 503 ficam em bitrix_client.post.
+    """
+    try:
+        response = bitrix_client.post(method, params)
+    except requests.RequestException as e:
+        logger.error("Erro de conexão com a API Bitrix (%s): %s", method, e)
+        return None
 
-    print(f"Cache {hash}.json carregado.")
-    return data, cache_path
+    if response.status_code == 200:
+        return response.json()
 
-def bitrix_api_call(method, params, max_retries=5, delay=2):
-    """Faz uma chamada à API do Bitrix e retorna o resultado."""
-    url = f"{BITRIX_WEBHOOK_URL}{method}.json"
-    retries = 0
+    logger.error("Erro na API Bitrix: %s - %s", response.status_code, response.text)
+    return None
 
-    while retries < max_retries:
-        response = requests.post(url, json=params)
+def build_query(params, prefix=""):
+    """Converte parâmetros aninhados no formato de query string usado pelo Bitrix (filter[X]=Y)."""
+    pairs = []
+    items = params.items() if isinstance(params, dict) else enumerate(params)
 
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 503 and "QUERY_LIMIT_EXCEEDED" in response.text:
-            print(f"Erro na API Bitrix: {response.status_code} - {response.text}. Tentando novamente em {delay} segundos...")
-            retries += 1
-            time.sleep(delay)
+    for key, value in items:
+        name = f"{prefix}[{key}]" if prefix else str(key)
+        if isinstance(value, (dict, list, tuple)):
+            pairs.append(build_query(value, name))
         else:
-            print(f"Erro na API Bitrix: {response.status_code} - {response.text}")
+            pairs.append(f"{quote(name, safe='[]')}={quote(str(value), safe='')}")
+
+    return "&".join(pair for pair in pairs if pair)
+
+def bitrix_batch_call(commands):
+    """
+    Executa vários comandos pelo método batch do Bitrix, até BATCH_LIMIT por requisição.
+
+    Parâmetros:
+        commands (dict): {chave: (método, parâmetros)}.
+
+    Retorno:
+        dict: {chave: resultado}. Comandos com erro ficam fora do dicionário.
+    """
+    results = {}
+    keys = list(commands)
+
+    for start in range(0, len(keys), BATCH_LIMIT):
+        chunk = keys[start:start + BATCH_LIMIT]
+        cmd = {key: f"{commands[key][0]}?{build_query(commands[key][1])}" for key in chunk}
+        metrics.increment("bitrix.batch_commands", len(cmd))
+        response = bitrix_api_call("batch", {"halt": 0, "cmd": cmd})
+
+        if not response or "result" not in response:
+            logger.error("Erro no batch do Bitrix para %s comandos.", len(chunk))
+            continue
+
+        results.update(response["result"].get("result") or {})
+        errors = response["result"].get("result_error")
+        if errors:
+            logger.error("Erros no batch do Bitrix: %s", errors)
+
+    return results
+
+def normalize_cnpj(cnpj):
+    """Mantém apenas os dígitos do CNPJ, para comparar formatos diferentes."""
+    return re.sub(r'\D', '', cnpj or '')
+
+def fetch_all_companies(extra_filter=None):
+    """
+    Percorre crm.company.list inteiro (páginas de 50). A primeira página informa o
+    total; as demais são pedidas via batch, até 50 páginas por requisição.
+    """
+    params = {
+        "order": {"ID": "ASC"},
+        "filter": extra_filter or {},
+        "select": COMPANY_INDEX_SELECT
+    }
+    first = bitrix_api_call("crm.company.list", dict(params, start=0))
+    if not first or "result" not in first:
+        return None
+
+    companies = list(first["result"])
+    total = int(first.get("total") or 0)
+
+    commands = {
+        f"p{start}": ("crm.company.list", dict(params, start=start))
+        for start in range(PAGE_SIZE, total, PAGE_SIZE)
+    }
+    pages = bitrix_batch_call(commands)
+    for key in commands:
+        if key not in pages:
+            logger.warning("Página %s da lista de empresas não retornada.", key[1:])
             return None
+        companies.extend(pages[key])
+
+    return companies
+
+def _rebuild_company_index():
+    """Reconstrói o índice CNPJ -> empresa; CNPJs repetidos ficam com o menor ID."""
+    global _company_index
+    index = {}
+    for company_id in sorted(_companies_by_id, key=int):
+        company = _companies_by_id[company_id]
+        cnpj = normalize_cnpj(company.get("UF_CRM_1701275490640"))
+        if cnpj:
+            index.setdefault(cnpj, company)
+    _company_index = index
+
+def save_company_index():
+    """Grava o índice em COMPANY_INDEX_FILE para ser reaproveitado na próxima execução."""
+    if not COMPANY_INDEX_FILE:
+        return
+
+    tmp_file = f"{COMPANY_INDEX_FILE}.tmp"
+    with _index_lock:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"date_modify": _index_date_modify, "built_at": _index_built_at, "companies": _companies_by_id}, f, ensure_ascii=False)
+        os.replace(tmp_file, COMPANY_INDEX_FILE)
+
+def load_company_index(full=False):
+    """
+    Carrega o índice de empresas. Se houver um índice salvo, busca apenas as empresas
+    alteradas desde o último DATE_MODIFY; senão (com full=True, ou se o índice salvo
+    tiver mais de COMPANY_INDEX_MAX_AGE segundos) percorre todas.
 
-    print(f"Número máximo de tentativas ({max_retries}) atingido.")
+    Retorno:
+        bool: True se o índice está disponível para as consultas.
+    """
+    global _companies_by_id, _index_date_modify, _index_built_at
+
+    saved = None
+    if not full and COMPANY_INDEX_FILE and os.path.exists(COMPANY_INDEX_FILE):
+        try:
+            with open(COMPANY_INDEX_FILE, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Erro ao ler %s: %s. Refazendo o índice completo.", COMPANY_INDEX_FILE, e)
+
+    if saved and COMPANY_INDEX_MAX_AGE and time.time() - (saved.get("built_at") or 0) > COMPANY_INDEX_MAX_AGE:
+        logger.info("🗂️ Índice de empresas com mais de %.0f segundos. Refazendo o índice completo.", COMPANY_INDEX_MAX_AGE)
+        saved = None
+
+    if saved and saved.get("date_modify"):
+        companies = fetch_all_companies({">=DATE_MODIFY": saved["date_modify"]})
+        if companies is None:
+            return False
+        by_id = saved.get("companies", {})
+        built_at = saved.get("built_at")
+        logger.info("🗂️ Índice de empresas atualizado: %s alteradas desde %s.", len(companies), saved['date_modify'])
+    else:
+        built_at = time.time()
+        companies = fetch_all_companies()
+        if companies is None:
+            return False
+        by_id = {}
+        logger.info("🗂️ Índice de empresas criado com %s empresas.", len(companies))
+
+    date_modify = saved.get("date_modify") if saved else None
+    for company in companies:
+        by_id[str(company["ID"])] = company
+        if company.get("DATE_MODIFY") and (date_modify is None or company["DATE_MODIFY"] > date_modify):
+            date_modify = company["DATE_MODIFY"]
+
+    _companies_by_id = by_id
+    _index_date_modify = date_modify
+    _index_built_at = built_at
+    _rebuild_company_index()
+    save_company_index()
+    return True
+
+def forget_company(company_id):
+    """
+    Remove do índice e dos caches da execução uma empresa que não existe mais no
+    Bitrix, para que o CNPJ volte a ser tratado como não cadastrado.
+    """
+    company_id = str(company_id)
+    for cnpj, company in list(_company_cache.items()):
+        if company and str(company.get("ID")) == company_id:
+            del _company_cache[cnpj]
+    for key in [key for key in _card_cache if key[1] == company_id]:
+        del _card_cache[key]
+
+    with _index_lock:
+        if _company_index is not None and _companies_by_id.pop(company_id, None) is not None:
+            _rebuild_company_index()
+            save_company_index()
+    logger.warning("🗑️ Empresa ID %s não existe mais no Bitrix e foi removida do índice.", company_id)
+
+def check_company_missing(company_id, response):
+    """
+    Confere a resposta de erro de uma chamada que usa o ID da empresa (crm.company.update,
+    crm.item.add). Se o Bitrix respondeu que a empresa não existe, remove-a do índice
+    (forget_company) e levanta CompanyNotFoundError.
+    """
+    if response.status_code not in (400, 404):
+        return
+
+    try:
+        error = response.json()
+    except ValueError:
+        return
+
+    description = str(error.get("error_description") or error.get("error") or "") if isinstance(error, dict) else ""
+    if "not found" in description.lower():
+        forget_company(company_id)
+        raise CompanyNotFoundError(f"A empresa ID {company_id} não existe mais no Bitrix")
+
+def prefetch_companies(cnpjs):
+    """Consulta em lote as empresas dos CNPJs ainda não consultados nesta execução."""
+    if _company_index is not None:
+        return  # O índice completo já responde todas as consultas
+
+    pending = sorted({cnpj for cnpj in cnpjs if cnpj and cnpj not in _company_cache})
+    if not pending:
+        return
+
+    commands = {
+        f"c{i}": ("crm.company.list", {"filter": {"UF_CRM_1701275490640": cnpj}, "select": COMPANY_SELECT})
+        for i, cnpj in enumerate(pending)
+    }
+    results = bitrix_batch_call(commands)
+
+    for i, cnpj in enumerate(pending):
+        result = results.get(f"c{i}")
+        if result is not None:
+            _company_cache[cnpj] = result[0] if result else None
+
+    logger.info("🔎 %s empresas consultadas em lote.", len(pending))
+
+def prefetch_cards(company_ids, entity_type_id, card_filter):
+    """Consulta em lote os cards de um SPA para as empresas ainda não consultadas."""
+    pending = sorted({str(company_id) for company_id in company_ids
+                      if company_id and (entity_type_id, str(company_id)) not in _card_cache})
+    if not pending:
+        return
+
+    commands = {
+        f"i{i}": ("crm.item.list", {
+            "entityTypeId": entity_type_id,
+            "filter": dict(card_filter, companyId=company_id),
+            "select": ["id"]
+        })
+        for i, company_id in enumerate(pending)
+    }
+    results = bitrix_batch_call(commands)
+
+    for i, company_id in enumerate(pending):
+        result = results.get(f"i{i}")
+        if result is not None:
+            _card_cache[(entity_type_id, company_id)] = [str(item["id"]) for item in result.get("items", [])]
+
+    logger.info("🔎 Cards de %s empresas consultados em lote (SPA %s).", len(pending), entity_type_id)
+
+def get_cached_cards(entity_type_id, company_id):
+    """Retorna os cards já consultados da empresa no SPA, ou None se ainda não consultados."""
+    return _card_cache.get((entity_type_id, str(company_id)))
+
+def register_card(entity_type_id, company_id, card_id):
+    """Registra no cache um card criado nesta execução."""
+    _card_cache.setdefault((entity_type_id, str(company_id)), []).append(str(card_id))
+
+def register_company(cnpj, company_id, system_id, created=False):
+    """
+    Registra no cache uma empresa criada ou atualizada nesta execução (e no índice
+    salvo, se carregado). Uma empresa recém-criada não tem cards em nenhum SPA, então
+    os cards também ficam em cache.
+    """
+    company = _company_cache.get(cnpj) or {"ID": str(company_id), "UF_CRM_1701275490640": cnpj}
+    company["UF_CRM_1708446996746"] = str(system_id)
+    _company_cache[cnpj] = company
+
+    with _index_lock:
+        if _company_index is not None:
+            indexed = _companies_by_id.setdefault(str(company_id), dict(company))
+            indexed["UF_CRM_1708446996746"] = str(system_id)
+            _company_index.setdefault(normalize_cnpj(cnpj), indexed)
+            save_company_index()
+
+    if created:
+        for config in MODELO_CONTRATO_CONFIG.values():
+            _card_cache.setdefault((config["entityTypeId"], str(company_id)), [])
+
+def combine_systems(system_ids):
+    """
+    Retorna o sistema que cobre todos os sistemas informados (ex.: "233" e "237" -> "655"),
+    ou None se algum não fizer parte de SYSTEM_PRODUCTS ou não houver combinação.
+    """
+    products = set()
+    for system_id in system_ids:
+        covered = SYSTEM_PRODUCTS.get(str(system_id))
+        if covered is None:
+            return None
+        products |= covered
+
+    for system_id, covered in SYSTEM_PRODUCTS.items():
+        if covered == products:
+            return system_id
     return None
 
 def check_company_system_affiliation(cnpj, expected_system_id):
@@ -81,7 +413,7 @@ def check_company_system_affiliation(cnpj, expected_system_id):
     """
     company_response = check_company_in_bitrix(cnpj)
     if not company_response or "result" not in company_response or not company_response["result"]:
-        print("Empresa não encontrada no Bitrix24.")
+        logger.debug("Empresa não encontrada no Bitrix24.")
         return False, None
 
     company_data = company_response["result"][0]
@@ -93,13 +425,147 @@ def check_company_system_affiliation(cnpj, expected_system_id):
     else:
         return False, SYSTEM_MAPPING.get(current_system_id, "Desconhecido")
 
+def get_cached_company(cnpj):
+    """
+    Responde a consulta por CNPJ pelo índice de empresas ou pelo cache da execução,
+    no formato do crm.company.list. Retorna None se o CNPJ ainda não foi consultado.
+    """
+    if _company_index is not None:
+        company = _company_index.get(normalize_cnpj(cnpj))
+        return {"result": [company] if company else []}
+
+    if cnpj in _company_cache:
+        company = _company_cache[cnpj]
+        return {"result": [company] if company else []}
+
+    return None
+
+def cache_company_response(cnpj, response):
+    """Guarda no cache da execução a resposta do crm.company.list para o CNPJ."""
+    if response and "result" in response:
+        _company_cache[cnpj] = response["result"][0] if response["result"] else None
+
 def check_company_in_bitrix(cnpj):
-    """Verifica se a empresa já está cadastrada no Bitrix pelo CNPJ."""
-    params = {
+    """
+    Verifica se a empresa já está cadastrada no Bitrix pelo CNPJ.
+
+    Com o índice de empresas carregado (load_company_index) a resposta é local. CNPJs
+    já consultados nesta execução (inclusive via prefetch_companies) também são
+    respondidos pelo cache, sem nova chamada à API.
+    """
+    cached = get_cached_company(cnpj)
+    if cached is not None:
+        return cached
+
+    response = bitrix_api_call("crm.company.list", build_company_lookup_payload(cnpj))
+    cache_company_response(cnpj, response)
+    return response
+
+def build_company_lookup_payload(cnpj):
+    """Monta o payload do crm.company.list que procura a empresa pelo CNPJ."""
+    return {
         "filter": {"UF_CRM_1701275490640": cnpj},
-        "select": ["ID", "UF_CRM_1701275490640", "UF_CRM_1708446996746"]
+        "select": COMPANY_SELECT
     }
-    return bitrix_api_call("crm.company.list", params)
+
+def build_recent_cards_payload(entity_type_id, company_id, since):
+    """
+    Monta o payload do crm.item.list que procura os cards da empresa criados a partir
+    de `since` (timestamp), em qualquer etapa.
+    """
+    created_since = datetime.fromtimestamp(since, timezone.utc).astimezone().isoformat(timespec='seconds')
+    return {
+        "entityTypeId": entity_type_id,
+        "filter": {"companyId": company_id, ">=createdTime": created_since},
+        "select": ["id"],
+        "order": {"id": "ASC"}
+    }
+
+def confirmed_company(cnpj, response):
+    """
+    Extrai a empresa de uma consulta por CNPJ feita direto na API e corrige com ela o
+    índice e o cache: a empresa que eles tinham para o CNPJ e a API não devolveu mais
+    é esquecida (forget_company). Levanta RuntimeError se a consulta falhou.
+    """
+    if not response or "result" not in response:
+        raise RuntimeError(f"Falha ao procurar a empresa com CNPJ {cnpj} no Bitrix")
+
+    company = response["result"][0] if response["result"] else None
+    known = get_cached_company(cnpj)
+    known = known["result"][0] if known and known["result"] else None
+    if known and (company is None or str(known["ID"]) != str(company["ID"])):
+        forget_company(known["ID"])
+
+    cache_company_response(cnpj, response)
+    if company:
+        register_company(cnpj, company["ID"], company.get("UF_CRM_1708446996746") or "")
+    return company
+
+def recovered_company_id(cnpj, response):
+    """
+    Extrai o ID da empresa de uma consulta feita para resolver uma criação pendente no
+    diário (ver confirmed_company). A falha da consulta levanta RuntimeError, para que a
+    intenção continue pendente em vez de virar uma segunda criação.
+    """
+    company = confirmed_company(cnpj, response)
+    return company["ID"] if company else None
+
+def recovered_card_id(company_id, response):
+    """Extrai o ID do card de uma consulta de build_recent_cards_payload (ver recovered_company_id)."""
+    if not response or "result" not in response:
+        raise RuntimeError(f"Falha ao procurar os cards da empresa ID {company_id} no Bitrix")
+
+    items = response["result"].get("items") or []
+    return str(items[0]["id"]) if items else None
+
+def find_company(cnpj):
+    """Consulta a empresa pelo CNPJ direto na API, sem o índice nem o cache (ver confirmed_company)."""
+    return confirmed_company(cnpj, bitrix_api_call("crm.company.list", build_company_lookup_payload(cnpj)))
+
+def find_company_id(cnpj):
+    """Procura a empresa pelo CNPJ direto na API, sem o cache da execução."""
+    return recovered_company_id(cnpj, bitrix_api_call("crm.company.list", build_company_lookup_payload(cnpj)))
+
+def find_card_created_since(entity_type_id, company_id, since):
+    """Procura direto na API um card da empresa criado a partir de `since`, em qualquer etapa."""
+    response = bitrix_api_call("crm.item.list", build_recent_cards_payload(entity_type_id, company_id, since))
+    return recovered_card_id(company_id, response)
+
+def build_company_system_payload(company_id, system_id):
+    """Monta o payload do crm.company.update que troca o sistema da empresa."""
+    return {"id": company_id, "fields": {"UF_CRM_1708446996746": system_id}}
+
+def company_system_updated(cnpj, company_id, system_id, response):
+    """Registra no cache o resultado do crm.company.update do sistema. Retorna True se o Bitrix aceitou."""
+    if not response or not response.get("result"):
+        logger.error("Erro ao atualizar o sistema da empresa com CNPJ %s.", cnpj)
+        return False
+
+    logger.info("Empresa com CNPJ %s atualizada para o sistema %s.", cnpj, SYSTEM_MAPPING.get(str(system_id), 'Desconhecido'))
+    register_company(cnpj, company_id, system_id)
+    return True
+
+def update_company_system(cnpj, company_id, system_id):
+    """
+    Atualiza o sistema (UF_CRM_1708446996746) da empresa no Bitrix. Levanta
+    CompanyNotFoundError se a empresa não existe mais.
+    """
+    response = bitrix_client.post("crm.company.update", build_company_system_payload(company_id, system_id))
+    if response.status_code != 200:
+        check_company_missing(company_id, response)
+        logger.error("Erro na API Bitrix: %s - %s", response.status_code, response.text)
+        return company_system_updated(cnpj, company_id, system_id, None)
+    return company_system_updated(cnpj, company_id, system_id, response.json())
+
+def card_id_from_response(response):
+    """Extrai o ID do card da resposta do crm.item.add (ou None)."""
+    if not response or "result" not in response:
+        return None
+
+    card_id = response["result"]
+    if isinstance(card_id, dict) and "item" in card_id and "id" in card_id["item"]:
+        card_id = card_id["item"]["id"]
+    return card_id
 
 def check_system_affiliation(company_data, system_id):
     """Verifica se a empresa está afiliada a um sistema específico com base no campo personalizado."""
@@ -129,26 +595,26 @@ def check_system_affiliation_from_cache(hash, modelo_contrato):
         return False
 
     if modelo_contrato not in MODELO_CONTRATO_CONFIG:
-        print(f"Modelo de Contrato inválido: {modelo_contrato}")
+        logger.debug("Modelo de Contrato inválido: %s", modelo_contrato)
         return False
 
     sistema_esperado = MODELO_CONTRATO_CONFIG[modelo_contrato]["system_id"]
     modelo_contrato_cache = cache_data.get("modeloDeContrato", "")
     if sistema_esperado not in modelo_contrato_cache:
-        print(f"Modelo de Contrato não é '{SYSTEM_MAPPING[sistema_esperado]}'")
-        print(f"Modelo do contrato -> {modelo_contrato_cache}")
+        logger.debug("Modelo de Contrato não é '%s'", SYSTEM_MAPPING[sistema_esperado])
+        logger.debug("Modelo do contrato -> %s", modelo_contrato_cache)
         return False
 
-    print(f"Modelo de Contrato contém ({modelo_contrato_cache})")
+    logger.debug("Modelo de Contrato contém (%s)", modelo_contrato_cache)
 
     cnpj = cache_data.get("cnpj")
     if not cnpj:
-        print("CNPJ não encontrado no cache.")
+        logger.debug("CNPJ não encontrado no cache.")
         return False
 
     company_response = check_company_in_bitrix(cnpj)
     if not company_response or "result" not in company_response or not company_response["result"]:
-        print("Empresa não encontrada no Bitrix.")
+        logger.debug("Empresa não encontrada no Bitrix.")
         return False
 
     company_data = company_response["result"][0]
@@ -157,13 +623,13 @@ def check_system_affiliation_from_cache(hash, modelo_contrato):
     company_code = company_data.get("UF_CRM_1708446996746", "").strip()
     company_is = SYSTEM_MAPPING.get(company_code, "Outro")
 
-    print(f"Empresa encontrada no Bitrix: ID {company_id}, CNPJ {company_cnpj}")
+    logger.debug("Empresa encontrada no Bitrix: ID %s, CNPJ %s", company_id, company_cnpj)
 
     if check_system_affiliation(company_data, sistema_esperado):
-        print(f"Empresa afiliada ao sistema {SYSTEM_MAPPING[sistema_esperado]}.")
+        logger.debug("Empresa afiliada ao sistema %s.", SYSTEM_MAPPING[sistema_esperado])
         return True
     else:
-        print(f"Empresa pertence a {company_is}")
+        logger.debug("Empresa pertence a %s", company_is)
         return False
 
 def check_card_exists(company_id):
@@ -182,10 +648,10 @@ def check_card_exists(company_id):
         card_ids = [str(item["id"]) for item in items if "id" in item]  # Captura os IDs dos cards existentes
 
         if card_ids:
-            print(f"✅ Cards encontrados para a empresa ID {company_id}: {card_ids}")
+            logger.debug("✅ Cards encontrados para a empresa ID %s: %s", company_id, card_ids)
             return card_ids[0]  # Retorna o primeiro card encontrado como string
 
-    print(f"❌ Nenhum card encontrado para a empresa ID {company_id}.")
+    logger.debug("❌ Nenhum card encontrado para a empresa ID %s.", company_id)
     return None  # Nenhum card encontrado
 
 def check_existing_card_in_spa(company_id, entity_type_id, bitrix_webhook_url):
@@ -209,8 +675,8 @@ def check_existing_card_in_spa(company_id, entity_type_id, bitrix_webhook_url):
         items = response["result"]["items"]
         if items:
             card_id = str(items[0]["id"])  # Pega o primeiro card encontrado
-            print(f"✅ Card encontrado para empresa ID {company_id} no SPA {entity_type_id}: {card_id}")
+            logger.debug("✅ Card encontrado para empresa ID %s no SPA %s: %s", company_id, entity_type_id, card_id)
             return card_id
 
-    print(f"❌ Nenhum card encontrado para empresa ID {company_id} no SPA {entity_type_id}.")
+    logger.debug("❌ Nenhum card encontrado para empresa ID %s no SPA %s.", company_id, entity_type_id)
     return None  # Nenhum card encontrado